@@ -2,6 +2,8 @@ import json
 import logging
 from flask import request, jsonify, render_template
 
+from core.cache import invalidate_contrib_cache
+
 ADMIN_TOKEN = ""
 POSTGRES_ENABLED = False
 _pg_connect = None
@@ -110,6 +112,7 @@ def admin_reverify_user_toilets():
         conn.close()
         try: _CACHE.clear()
         except Exception: pass
+        invalidate_contrib_cache()
         return jsonify({
             "ok": True,
             "apply": apply_update,
@@ -631,6 +634,8 @@ def api_user_toilet_review():
             _CACHE.clear()
         except Exception:
             pass
+        # 審核會改到使用者「我的貢獻」的狀態：其他 worker 的清單也要失效
+        invalidate_contrib_cache()
 
         return jsonify({
             "ok": True,
@@ -70,7 +70,7 @@ from linebot_app.handlers import (
 from toilet.scoring import compute_nts_score, sort_toilets_nts_1_0
 from toilet.floor import _floor_from_name
 from toilet.identity import _make_toilet_id
-from toilet.data_sources import TOILETS_FILE_PATH, geocode_address
+from toilet.data_sources import _load_public_csv_cached, geocode_address, start_public_csv_warmup_background
 from toilet.search import register_search_routes, build_nearby_toilets
 from toilet.cleanliness import configure_cleanliness, expected_from_feats, compute_nowcast_ci, LAST_N_HISTORY
 from toilet.feedback import (
@@ -155,6 +155,7 @@ configure_recommendation_logs(
     compute_nts_score_func=compute_nts_score,
     sort_toilets_nts_1_0_func=sort_toilets_nts_1_0,
     make_toilet_id_func=_make_toilet_id,
+    psycopg2_module=psycopg2,
 )
 _start_consent_worker()
 
@@ -195,6 +196,7 @@ create_cache_db()
 tune_sqlite_for_concurrency()
 create_analytics_tables()
 _start_persistent_store_init_background()
+start_public_csv_warmup_background()
 
 
 # -----------------------------------------------------------------------------
@@ -219,7 +221,7 @@ configure_auto_verify(
     postgres_enabled=POSTGRES_ENABLED,
     pg_connect=_pg_connect,
     psycopg2_module=psycopg2,
-    toilets_file_path=TOILETS_FILE_PATH,
+    load_public_csv_func=_load_public_csv_cached,
     geocode_address_func=geocode_address,
     haversine_func=haversine,
     in_bbox_func=_in_bbox,
@@ -30,6 +30,11 @@ ENRICH_MAX_ITEMS = int(os.getenv("ENRICH_MAX_ITEMS", "60"))
 OVERPASS_MAX_ITEMS = int(os.getenv("OVERPASS_MAX_ITEMS", "60"))
 ENRICH_LRU_SIZE = int(os.getenv("ENRICH_LRU_SIZE", "300"))
 NEARBY_LRU_SIZE = int(os.getenv("NEARBY_LRU_SIZE", "300"))
+OVERPASS_LRU_SIZE = int(os.getenv("OVERPASS_LRU_SIZE", "1024"))
+OVERPASS_CACHE_TTL = int(os.getenv("OVERPASS_CACHE_TTL", "3600"))
+GEOCODE_LRU_SIZE = int(os.getenv("GEOCODE_LRU_SIZE", "2048"))
+USER_STATE_LRU_SIZE = int(os.getenv("USER_STATE_LRU_SIZE", "100000"))
+USER_STATE_TTL_SEC = int(os.getenv("USER_STATE_TTL_SEC", "86400"))
 
 # Feedback / status index cache settings
 FEEDBACK_INDEX_TTL = int(os.getenv("FEEDBACK_INDEX_TTL", "180"))
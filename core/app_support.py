@@ -1,10 +1,17 @@
 import os
 import json
 import logging
-import requests
 import random
 import time
 from flask import request, Response, redirect
+from flask.json.provider import DefaultJSONProvider
+
+from core.http import http_session
+
+try:
+    import orjson
+except Exception:
+    orjson = None
 
 POSTGRES_ENABLED = False
 log_user_action = None
@@ -78,7 +85,7 @@ def add_security_headers(resp):
             ]
             resp.headers["Content-Security-Policy"] = "; ".join(csp) + ";"
     except Exception as e:
-        logging.debug(f"add_security_headers skipped: {e}")
+        logging.debug("add_security_headers skipped: %s", e)
     return resp
 
 
@@ -148,7 +155,7 @@ def _self_keepalive_background():
     headers = {"User-Agent": f"SelfKeepalive/1.0 (+{os.getenv('CONTACT_EMAIL','you@example.com')})"}
     while True:
         try:
-            requests.head(KEEPALIVE_URL, timeout=8, headers=headers)
+            http_session.head(KEEPALIVE_URL, timeout=8, headers=headers)
             logging.debug("✅ keepalive ok")
         except Exception as e:
             logging.debug(f"⚠️ keepalive failed: {e}")
@@ -156,7 +163,36 @@ def _self_keepalive_background():
         time.sleep(sleep_for)
 
 
+class OrjsonJSONProvider(DefaultJSONProvider):
+    """
+    jsonify / request.get_json 改用 orjson（有安裝時）。
+    datetime/date 仍交給 Flask 預設的 default（HTTP date 格式），Decimal 等同理，輸出內容不變；
+    差別只在中文直接輸出 UTF-8、不轉 \\uXXXX。其他 json.dumps 參數走回 Flask 原本實作。
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {"indent", "separators"}:
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                # orjson 不收 NaN/Infinity 等 stdlib 可接受的寫法，交給原本實作判斷
+                pass
+        return super().loads(s, **kwargs)
+
+
 def register_app_support_routes(app):
+    if orjson is not None:
+        app.json = OrjsonJSONProvider(app)
     app.after_request(add_security_headers)
     app.add_url_rule("/readyz", view_func=readyz, methods=["GET", "HEAD"])
     logging.getLogger("werkzeug").addFilter(_NoHealthzFilter())
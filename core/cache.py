@@ -5,7 +5,8 @@ Extracted from app.py without changing behavior.
 
 from collections import OrderedDict
 
-from config import ENRICH_LRU_SIZE, NEARBY_LRU_SIZE
+from config import ENRICH_LRU_SIZE, NEARBY_LRU_SIZE, OVERPASS_LRU_SIZE, GEOCODE_LRU_SIZE
+from core.database import bump_shared_cache_version, shared_cache_version
 
 
 class SimpleLRU(OrderedDict):
@@ -19,13 +20,50 @@ class SimpleLRU(OrderedDict):
             return super().get(key)
         return default
 
-    def set(self, key, value):
+    def __setitem__(self, key, value):
+        # cache[key] = value 也要套用上限，不能只有 .set() 才淘汰
         super().__setitem__(key, value)
         self.move_to_end(key)
         while len(self) > self.maxsize:
             self.popitem(last=False)
 
+    def set(self, key, value):
+        self[key] = value
+
 
 # ------ 將原本的 dict 換成 LRU（⚠️ 別在檔案其他地方再賦值覆蓋它們）------
 _ENRICH_CACHE = SimpleLRU(maxsize=ENRICH_LRU_SIZE)
 _CACHE = SimpleLRU(maxsize=NEARBY_LRU_SIZE)
+_OVERPASS_CACHE = SimpleLRU(maxsize=OVERPASS_LRU_SIZE)
+_GEOCODE_CACHE = SimpleLRU(maxsize=GEOCODE_LRU_SIZE)
+
+
+def contrib_cache_key(uid):
+    """_CACHE 裡「我的貢獻」清單的 key；單一使用者異動時只需丟掉這一筆。"""
+    return ("contrib", uid)
+
+
+# 「我的貢獻」跨 worker 失效用的版本號：使用者新增/刪除只動自己的 key，
+# 管理端審核會改到任何人的狀態，動全域的 key
+_CONTRIB_VERSION_ALL = "contrib"
+
+
+def contrib_cache_version(uid):
+    """回傳 (全域版本, 使用者版本)；任一讀不到回傳 None（呼叫端不用快取）。"""
+    v_all = shared_cache_version(_CONTRIB_VERSION_ALL)
+    v_uid = shared_cache_version(f"contrib:{uid}")
+    if v_all is None or v_uid is None:
+        return None
+    return (v_all, v_uid)
+
+
+def invalidate_contrib_cache(uid=None):
+    """丟掉本 process 的清單並通知其他 worker；uid=None 代表所有使用者。"""
+    if uid is None:
+        bump_shared_cache_version(_CONTRIB_VERSION_ALL)
+        return
+    try:
+        _CACHE.pop(contrib_cache_key(uid), None)
+    except Exception:
+        pass
+    bump_shared_cache_version(f"contrib:{uid}")
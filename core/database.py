@@ -4,6 +4,7 @@ This module intentionally keeps the original function bodies unchanged.
 Only the module boundary changed.
 """
 
+import atexit
 import os
 import json
 import logging
@@ -19,6 +20,11 @@ try:
 except Exception:
     psycopg2 = None
 
+try:
+    import orjson
+except Exception:
+    orjson = None
+
 # Keep .env loading safe when this module is imported directly.
 load_dotenv()
 
@@ -459,13 +465,16 @@ def _get_db():
     """Return a SQLite connection to the app database (CACHE_DB_PATH).
 
     This is the single entry point for all SQLite access in the app
-    (user_lang, search_log, ai_quota, request_cache, analytics_events).
+    (user_lang, search_log, ai_quota, favorites, request_cache, analytics_events).
     It was previously provided by a now-deleted initialization block;
     restored here so that set_user_lang / get_user_lang /
     handle_location / _ai_quota_check_and_inc work correctly.
     """
     conn = sqlite3.connect(CACHE_DB_PATH, timeout=5, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    # 檔案已是 WAL（tune_sqlite_for_concurrency）：NORMAL 下 commit 不必每次 fsync，
+    # 最愛/語言等小筆寫入只有整台機器斷電才可能丟最後幾筆
+    conn.execute("PRAGMA synchronous=NORMAL;")
     return conn
 
 # 建立 SQLite 連線
@@ -509,6 +518,31 @@ def create_cache_db():
         "CREATE INDEX IF NOT EXISTS idx_search_log_user_id ON search_log(user_id)"
     )
 
+    # Local favorites fallback (used only when Postgres is disabled) —
+    # read/written by toilet.favorites; replaces the old favorites.txt scans.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS favorites (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        lat TEXT NOT NULL,
+        lon TEXT NOT NULL,
+        address TEXT,
+        UNIQUE (user_id, name, lat, lon)
+    )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_favorites_user_id ON favorites(user_id)"
+    )
+
+    # Cross-worker cache invalidation counters — see shared_cache_version().
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS cache_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+
     # AI quota tracking — read/written by _ai_quota_check_and_inc.
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS ai_quota (
@@ -538,29 +572,171 @@ def tune_sqlite_for_concurrency():
         logging.warning(f"SQLite tuning skipped: {e}")
 
 # 確認快取是否有效
+# request_cache 每次查詢都會讀寫：每個執行緒保留一條連線，不必每次 connect/close。
+# synchronous=NORMAL 在 WAL 下已足夠安全（最多遺失最後一筆快取），寫入不用等 fsync。
+_CACHE_CONN_TLS = threading.local()
+
+def _cache_conn():
+    conn = getattr(_CACHE_CONN_TLS, "conn", None)
+    if conn is None or getattr(_CACHE_CONN_TLS, "path", None) != CACHE_DB_PATH:
+        conn = sqlite3.connect(CACHE_DB_PATH, timeout=5, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("PRAGMA busy_timeout=3000;")
+        _CACHE_CONN_TLS.conn = conn
+        _CACHE_CONN_TLS.path = CACHE_DB_PATH
+    return conn
+
+def _drop_cache_conn():
+    conn = getattr(_CACHE_CONN_TLS, "conn", None)
+    _CACHE_CONN_TLS.conn = None
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+# request_cache 每次附近查詢都會序列化/反序列化整份結果；有 orjson 時用 orjson。
+# orjson 不吃的內容（非字串 key、舊資料裡的 NaN）退回標準 json，兩邊格式互通。
+def _cache_dumps(data):
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY).decode("utf-8")
+        except TypeError:
+            pass
+    return json.dumps(data)
+
+
+def _cache_loads(raw):
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(raw)
+
+
 def get_cached_data(query_key, ttl_sec=60*5):
-    conn = sqlite3.connect(CACHE_DB_PATH, timeout=5, check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute("SELECT data, timestamp FROM request_cache WHERE query_key = ?", (query_key,))
-    result = cursor.fetchone()
-    conn.close()
+    try:
+        cursor = _cache_conn().execute(
+            "SELECT data, timestamp FROM request_cache WHERE query_key = ?", (query_key,)
+        )
+        result = cursor.fetchone()
+    except sqlite3.Error:
+        # 連線壞掉就丟掉，下次重連
+        _drop_cache_conn()
+        raise
 
     if result:
         data, timestamp = result
         if time.time() - timestamp < ttl_sec:
-            return json.loads(data)
+            return _cache_loads(data)
     return None
 
 # 儲存快取
 def save_cache(query_key, data):
-    conn = sqlite3.connect(CACHE_DB_PATH, timeout=5, check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute("""
-    INSERT OR REPLACE INTO request_cache (query_key, data, timestamp)
-    VALUES (?, ?, ?)
-    """, (query_key, json.dumps(data), time.time()))
-    conn.commit()
-    conn.close()
+    conn = _cache_conn()
+    try:
+        conn.execute("""
+        INSERT OR REPLACE INTO request_cache (query_key, data, timestamp)
+        VALUES (?, ?, ?)
+        """, (query_key, _cache_dumps(data), time.time()))
+        conn.commit()
+    except sqlite3.Error:
+        _drop_cache_conn()
+        raise
+
+# === 跨 worker 快取失效 ===
+# 各 gunicorn worker 各自有記憶體快取（最愛、我的貢獻、回饋、狀態），只清自己 process 的話，
+# 使用者剛改完、下一個請求落到另一個 worker 就會看到舊資料。
+# 寫入端在 cache.db 把版本號 +1；讀取端快取時記下「讀 DB 前」的版本，命中前先比對。
+def shared_cache_version(name):
+    """回傳目前版本號；讀不到（表不存在、鎖住等）回傳 None，呼叫端應視為快取失效。"""
+    try:
+        row = _cache_conn().execute(
+            "SELECT version FROM cache_versions WHERE name = ?", (name,)
+        ).fetchone()
+    except sqlite3.Error as e:
+        _drop_cache_conn()
+        logging.warning("讀取快取版本失敗（%s）：%s", name, e)
+        return None
+    return row[0] if row else 0
+
+
+def bump_shared_cache_version(name):
+    """資料異動後呼叫：讓所有 worker 手上 name 的快取失效。
+    回傳這次 +1 之後的版本號（同一個交易內讀回，不會混到別人的 +1）；失敗回傳 None。"""
+    try:
+        conn = _cache_conn()
+        conn.execute("""
+        INSERT INTO cache_versions (name, version) VALUES (?, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1
+        """, (name,))
+        row = conn.execute("SELECT version FROM cache_versions WHERE name = ?", (name,)).fetchone()
+        conn.commit()
+    except sqlite3.Error as e:
+        _drop_cache_conn()
+        logging.warning("更新快取版本失敗（%s）：%s", name, e)
+        return None
+    return row[0] if row else None
+
+# === search_log 緩衝寫入 ===
+# 每則定位訊息原本都要開一次 SQLite、INSERT、commit、關閉；改成先進記憶體佇列，
+# 累積 N 筆或每隔幾秒由背景執行緒一次 executemany。讀取次數前先 flush_search_log()。
+_SEARCH_LOG_BUF = []
+_SEARCH_LOG_LOCK = threading.Lock()
+_SEARCH_LOG_FLUSH_N = int(os.getenv("SEARCH_LOG_FLUSH_N", "32"))
+_SEARCH_LOG_FLUSH_SEC = float(os.getenv("SEARCH_LOG_FLUSH_SEC", "2"))
+_SEARCH_LOG_WORKER_STARTED = False
+
+
+def log_search(uid, lat, lon, ts):
+    """排入一筆 search_log（lat/lon 為已正規化字串，ts 為 UTC 字串）。"""
+    with _SEARCH_LOG_LOCK:
+        _SEARCH_LOG_BUF.append((uid, lat, lon, ts))
+        full = len(_SEARCH_LOG_BUF) >= _SEARCH_LOG_FLUSH_N
+    if full:
+        flush_search_log()
+    else:
+        _start_search_log_worker()
+
+
+def flush_search_log():
+    global _SEARCH_LOG_BUF
+    with _SEARCH_LOG_LOCK:
+        if not _SEARCH_LOG_BUF:
+            return
+        rows, _SEARCH_LOG_BUF = _SEARCH_LOG_BUF, []
+    try:
+        conn = _get_db()
+        try:
+            conn.executemany(
+                "INSERT INTO search_log (user_id, lat, lon, ts) VALUES (?,?,?,?)", rows
+            )
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception as e:
+        logging.warning("寫入 search_log 失敗（%d 筆）：%s", len(rows), e)
+
+
+def _start_search_log_worker():
+    global _SEARCH_LOG_WORKER_STARTED
+    if _SEARCH_LOG_WORKER_STARTED:
+        return
+    with _SEARCH_LOG_LOCK:
+        if _SEARCH_LOG_WORKER_STARTED:
+            return
+        _SEARCH_LOG_WORKER_STARTED = True
+
+    def loop():
+        while True:
+            time.sleep(_SEARCH_LOG_FLUSH_SEC)
+            flush_search_log()
+
+    threading.Thread(target=loop, name="search-log-flush", daemon=True).start()
+
+
+atexit.register(flush_search_log)
 
 ANALYTICS_DB_PATH = CACHE_DB_PATH
 
@@ -0,0 +1,127 @@
+"""Batch distance helpers for nearby-toilet queries.
+
+core.utils.haversine stays the scalar entry point. This module holds the
+array versions used when a whole data source is scanned at once.
+
+NumPy and scikit-learn are optional (same as pandas in toilet/cleanliness.py):
+callers must check ``np is not None`` / a non-None index and keep their
+per-row fallback.
+"""
+
+import math
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+try:
+    from sklearn.neighbors import BallTree
+except Exception:
+    BallTree = None
+
+from core.utils import haversine
+
+EARTH_RADIUS_M = 6371000.0
+# 每度緯度的公尺數（與 haversine 用同一個地球半徑）
+_M_PER_DEG = math.radians(1.0) * EARTH_RADIUS_M
+
+
+def haversine_np(lat, lon, lat_arr, lon_arr):
+    """
+    一次計算 (lat, lon) 到整個座標陣列的距離（公尺）。
+    lat_arr / lon_arr 為 numpy 陣列；NaN 會得到 NaN，比較時自然被排除。
+    """
+    lat1 = math.radians(float(lat))
+    lon1 = math.radians(float(lon))
+    lat2 = np.radians(lat_arr)
+    dlat = lat2 - lat1
+    dlon = np.radians(lon_arr) - lon1
+    a = np.sin(dlat * 0.5) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon * 0.5) ** 2
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def build_point_index(lat_arr, lon_arr):
+    """
+    建立 haversine BallTree 空間索引（scikit-learn 不在時回傳 None）。
+    回傳 (tree, row_idx)：row_idx 把樹內位置對回原陣列列號（NaN 座標不入樹）。
+    """
+    if BallTree is None or np is None:
+        return None
+    valid = np.isfinite(lat_arr) & np.isfinite(lon_arr)
+    row_idx = np.flatnonzero(valid)
+    if row_idx.size == 0:
+        return None
+    pts = np.radians(np.column_stack((lat_arr[row_idx], lon_arr[row_idx])).astype(np.float64))
+    return BallTree(pts, metric="haversine"), row_idx
+
+
+def query_point_index(index, lat, lon, radius_m):
+    """半徑查詢：回傳 (原陣列列號, 距離公尺)，已依距離由近到遠排序。"""
+    tree, row_idx = index
+    q = np.radians(np.array([[float(lat), float(lon)]], dtype=np.float64))
+    ind, dist = tree.query_radius(q, r=float(radius_m) / EARTH_RADIUS_M, return_distance=True, sort_results=True)
+    return row_idx[ind[0]], dist[0] * EARTH_RADIUS_M
+
+
+# 格網索引：沒有 scikit-learn 時的次線性替代。0.005 度 ≈ 550 公尺，
+# 500 公尺半徑查詢大約只需看 3x3 格。
+GRID_CELL_DEG = 0.005
+
+
+def build_grid_index(lat_arr, lon_arr, cell_deg=GRID_CELL_DEG):
+    """
+    依 (lat, lon) 格點分組列號：回傳 {"cell": cell_deg, "cells": {(ix, iy): 列號陣列/串列}}。
+    lat_arr / lon_arr 可為 numpy 陣列或 list；NaN 座標不入格。
+    """
+    cells = {}
+    if np is not None and isinstance(lat_arr, np.ndarray):
+        valid = np.flatnonzero(np.isfinite(lat_arr) & np.isfinite(lon_arr))
+        if valid.size:
+            ix = np.floor(lat_arr[valid] / cell_deg).astype(np.int64)
+            iy = np.floor(lon_arr[valid] / cell_deg).astype(np.int64)
+            order = np.lexsort((iy, ix))
+            ix, iy, rows = ix[order], iy[order], valid[order]
+            # 相同格子的列在排序後相鄰，切出每一段
+            starts = np.flatnonzero(np.r_[True, (ix[1:] != ix[:-1]) | (iy[1:] != iy[:-1])])
+            ends = np.r_[starts[1:], rows.size]
+            for s, e in zip(starts.tolist(), ends.tolist()):
+                cells[(int(ix[s]), int(iy[s]))] = rows[s:e]
+    else:
+        for i, (t_lat, t_lon) in enumerate(zip(lat_arr, lon_arr)):
+            if t_lat != t_lat or t_lon != t_lon:  # NaN
+                continue
+            key = (math.floor(t_lat / cell_deg), math.floor(t_lon / cell_deg))
+            cells.setdefault(key, []).append(i)
+    return {"cell": cell_deg, "cells": cells}
+
+
+def grid_candidates(grid, min_lat, max_lat, min_lon, max_lon):
+    """回傳落在矩形範圍所涵蓋格子內的列號（numpy 陣列或 list，視建索引時的型別）。"""
+    cell = grid["cell"]
+    cells = grid["cells"]
+    parts = []
+    for ix in range(math.floor(min_lat / cell), math.floor(max_lat / cell) + 1):
+        for iy in range(math.floor(min_lon / cell), math.floor(max_lon / cell) + 1):
+            rows = cells.get((ix, iy))
+            if rows is not None and len(rows):
+                parts.append(rows)
+    if np is not None and parts and isinstance(parts[0], np.ndarray):
+        return np.concatenate(parts)
+    return [i for part in parts for i in part]
+
+
+def haversine_many(lat, lon, lats, lons):
+    """
+    批次距離（公尺），回傳 list[float]。
+    有 numpy 時一次向量化計算；否則逐筆走 core.utils.haversine。
+    """
+    if not lats:
+        return []
+    if np is not None:
+        return haversine_np(
+            lat, lon,
+            np.asarray(lats, dtype=np.float64),
+            np.asarray(lons, dtype=np.float64),
+        ).tolist()
+    return [haversine(lat, lon, t_lat, t_lon) for t_lat, t_lon in zip(lats, lons)]
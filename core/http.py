@@ -0,0 +1,83 @@
+"""Shared outbound HTTP session.
+
+Overpass / Nominatim calls used to go through bare ``requests.get/post``,
+paying a DNS lookup and TLS handshake on every search. One pooled Session
+keeps connections alive between requests and across worker threads.
+``http_session_no_retry`` shares the same settings without urllib3 retries,
+for callers that already pace or fail over on their own (Overpass, Nominatim).
+
+``response_json`` parses bodies with orjson when it is installed (Overpass
+payloads can reach several MB) and falls back to ``resp.json()``.
+"""
+
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+
+def _int_env(name, default):
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _build_session(max_retries=None):
+    pool_size = max(1, _int_env("HTTP_POOL_SIZE", 10))
+    if max_retries is None:
+        # 只重試閘道類暫時錯誤；429 是對方要求降速，不在這裡自動重打
+        max_retries = Retry(
+            total=max(0, _int_env("HTTP_MAX_RETRIES", 2)),
+            backoff_factor=0.5,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "POST"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=max_retries)
+
+    s = requests.Session()
+    # Overpass / Nominatim 規範要求可識別的 User-Agent；呼叫端仍可用 headers 覆寫
+    s.headers["User-Agent"] = f"ToiletBot/1.0 (+{os.getenv('CONTACT_EMAIL', 'you@example.com')})"
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+http_session = _build_session()
+# 不自動重試的連線池：Overpass 呼叫端自己輪替 endpoint 並有整體期限，
+# urllib3 的 backoff 會把請求拖過期限；節奏完全交給呼叫端控制
+http_session_no_retry = _build_session(max_retries=0)
+
+
+# Nominatim 使用規範每秒最多 1 次：同一 process 內所有呼叫（正向/反向地理編碼）共用節流，
+# 而且走 http_session_no_retry，不讓 urllib3 重試在節流之外多打
+_NOMINATIM_MIN_INTERVAL = 1.0
+_NOMINATIM_LOCK = threading.Lock()
+_NOMINATIM_NEXT_AT = 0.0
+
+
+def nominatim_throttle():
+    global _NOMINATIM_NEXT_AT
+    with _NOMINATIM_LOCK:
+        now = time.monotonic()
+        wait = _NOMINATIM_NEXT_AT - now
+        _NOMINATIM_NEXT_AT = max(now, _NOMINATIM_NEXT_AT) + _NOMINATIM_MIN_INTERVAL
+    if wait > 0:
+        time.sleep(wait)
+
+
+def response_json(resp):
+    """解析 JSON 回應；有 orjson 用 orjson（直接吃 bytes），否則走 requests 內建。"""
+    if orjson is not None:
+        return orjson.loads(resp.content)
+    return resp.json()
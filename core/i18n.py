@@ -1,6 +1,7 @@
 import os
 import json
 import logging
+from functools import lru_cache
 from flask import request
 
 # _get_db is injected by app.py after the SQLite helper is defined.
@@ -130,9 +131,16 @@ def _load_lang_pack(lang_code: str):
             data = json.load(f)
         if not isinstance(data, dict):
             return {"texts": {}, "literals": {}}
+        literals = data.get("literals", {}) or {}
         return {
             "texts": data.get("texts", {}) or {},
-            "literals": data.get("literals", {}) or {}
+            "literals": literals,
+            # 子字串替換用：長字串優先，載入時排好一次（每則訊息的每段文字都會用到）
+            "literals_by_len": [
+                (src, dst)
+                for src, dst in sorted(literals.items(), key=lambda kv: len(kv[0]), reverse=True)
+                if src
+            ],
         }
     except Exception as e:
         logging.warning(f"load lang pack failed ({lang_code}): {e}")
@@ -153,6 +161,12 @@ def _lang_text(key: str, lang: str):
 def _translate_literal_runtime(text: str, lang: str):
     if not isinstance(text, str) or not text:
         return text
+    return _translate_literal_cached(text, lang)
+
+# 語言包在 import 時就固定，同一字串的替換結果不會變；
+# Flex 卡片每張都要翻十幾個固定標籤/前綴，記住結果就不必每次掃整份 literals
+@lru_cache(maxsize=int(os.getenv("I18N_LITERAL_CACHE_SIZE", "4096")))
+def _translate_literal_cached(text: str, lang: str):
     pack = _LANG_PACKS.get(lang, {})
     literals = pack.get("literals", {}) if isinstance(pack, dict) else {}
     if not literals:
@@ -164,8 +178,8 @@ def _translate_literal_runtime(text: str, lang: str):
 
     out = text
     try:
-        for src, dst in sorted(literals.items(), key=lambda kv: len(kv[0]), reverse=True):
-            if src and src in out:
+        for src, dst in pack.get("literals_by_len", ()):
+            if src in out:
                 out = out.replace(src, dst)
     except Exception:
         return text
@@ -9,6 +9,7 @@ import hashlib
 import html
 import logging
 import math
+import time
 from math import radians, cos, sin, asin, sqrt
 
 
@@ -23,6 +24,17 @@ def grid_coord(v, g=0.0005):
         return v
 
 
+def bbox_bounds(clat, clon, radius_m):
+    """
+    與 _in_bbox 相同的矩形範圍，回傳 (min_lat, max_lat, min_lon, max_lon)。
+    迴圈前算一次，逐筆只剩比較，不必每筆重算 cos。
+    """
+    clat = float(clat); clon = float(clon)
+    dlat = radius_m / 111000.0
+    dlon = radius_m / (111000.0 * math.cos(math.radians(clat)))
+    return clat - dlat, clat + dlat, clon - dlon, clon + dlon
+
+
 def _in_bbox(lat, lon, clat, clon, radius_m):
     """
     粗略矩形篩選，先擋掉不可能在半徑內的點
@@ -71,13 +83,31 @@ def _parse_lat_lon(lat_s, lon_s):
     return lat, lon
 
 
-def haversine(lat1, lon1, lat2, lon2):
+_DEG2RAD = math.pi / 180.0
+
+
+def haversine(lat1, lon1, lat2, lon2, _sin=sin, _cos=cos, _asin=asin, _sqrt=sqrt):
+    # 逐筆比對的熱路徑：不建 list/map，數學函式綁成區域變數
     try:
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-        return 2 * asin(sqrt(a)) * 6371000  # m
+        lat1 = float(lat1) * _DEG2RAD
+        lat2 = float(lat2) * _DEG2RAD
+        s1 = _sin((lat2 - lat1) * 0.5)
+        s2 = _sin((float(lon2) - float(lon1)) * (_DEG2RAD * 0.5))
+        return 12742000.0 * _asin(_sqrt(s1 * s1 + _cos(lat1) * _cos(lat2) * s2 * s2))  # m
     except Exception as e:
         logging.error(f"計算距離失敗: {e}")
         return float("inf")
+
+
+_UTC_TS_CACHE = (0, "")
+
+
+def utc_now_str():
+    """UTC「YYYY-mm-dd HH:MM:SS」字串；同一秒內重用上次的格式化結果。"""
+    global _UTC_TS_CACHE
+    now = int(time.time())
+    sec, text = _UTC_TS_CACHE
+    if sec != now:
+        text = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(now))
+        _UTC_TS_CACHE = (now, text)
+    return text
@@ -1,12 +1,12 @@
 import os
 import logging
 import sqlite3
-import requests
 from datetime import datetime, timezone, timedelta
 
 from flask import request, jsonify, render_template
 
 from config import TW_TZ
+from core.http import http_session
 
 POSTGRES_ENABLED = False
 _pg_connect = None
@@ -550,7 +550,7 @@ def api_line_insights():
         app_type = []
         subscription_period = []
 
-        r = requests.get(
+        r = http_session.get(
             f"https://api.line.me/v2/bot/insight/followers?date={query_date}",
             headers=headers,
             timeout=10
@@ -564,7 +564,7 @@ def api_line_insights():
         else:
             logging.warning(f"followers insight failed: {r.status_code} {r.text}")
 
-        r2 = requests.get(
+        r2 = http_session.get(
             "https://api.line.me/v2/bot/insight/demographic",
             headers=headers,
             timeout=10
@@ -3,12 +3,14 @@ import json
 import logging
 import threading
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from flask import request, redirect, render_template
 from openai import OpenAI
 
 from config import TW_TZ
+from core.database import flush_search_log
 from core.i18n import resolve_lang
 
 _get_db = None
@@ -179,6 +181,8 @@ def _stats_for_user(uid: str):
 
 def get_search_count(uid: str) -> int:
     try:
+        # 先把還在緩衝區的查詢紀錄寫進去，次數才會即時
+        flush_search_log()
         conn = _get_db()
         cur = conn.cursor()
         cur.execute("SELECT COUNT(*) FROM search_log WHERE user_id = ?", (uid,))
@@ -319,30 +323,40 @@ def api_achievements():
 
     return {"ok": True, "achievements": out}, 200
 
+# 使用回顧的四項資料彼此獨立（SQLite 一次、Neon 三次），同時查，不再一個等一個
+_review_pool = ThreadPoolExecutor(max_workers=4)
+
+
 def build_usage_review_text(uid: str) -> str:
     # 改成用 DB 裡的 search_log 統計查詢次數
-    search_times = get_search_count(uid)
+    f_search = _review_pool.submit(get_search_count, uid)
+    f_stats = _review_pool.submit(_stats_for_user, uid)
+    f_contribs = _review_pool.submit(get_user_contributions, uid)
+    f_favs = _review_pool.submit(get_user_favorites, uid)
 
-    stats = _stats_for_user(uid)
+    search_times = f_search.result()
+
+    stats = f_stats.result()
     total = int(stats.get("total", 0) or 0)
     by = stats.get("by_status", {}) or {}
     last_ts = stats.get("last_ts") or L(uid, "尚無紀錄", "No record")
 
     try:
-        contribs = get_user_contributions(uid) or []
+        contribs = f_contribs.result() or []
         num_contribs = len(contribs)
     except Exception:
         num_contribs = 0
 
     try:
-        favs = get_user_favorites(uid) or []
+        favs = f_favs.result() or []
         num_favs = len(favs)
     except Exception:
         num_favs = 0
 
     unlocked_badges = 0
     try:
-        rules = _badge_rules(uid)
+        # 徽章規則只看狀態回報統計，直接沿用上面那份，不再讀一次
+        rules = _badge_rules_from_stats(stats)
         unlocked_badges = sum(1 for v in rules.values() if v)
     except Exception:
         pass
@@ -704,7 +718,10 @@ Please output user-facing text only. Do NOT include JSON or technical descriptio
         return ""
 
 def _badge_rules(uid: str):
-    s = _stats_for_user(uid)
+    return _badge_rules_from_stats(_stats_for_user(uid))
+
+
+def _badge_rules_from_stats(s):
     by = s.get("by_status", {}) or {}
     total = int(s.get("total", 0) or 0)
 
@@ -0,0 +1,23 @@
+"""Gunicorn settings for the `web` process (see Procfile).
+
+gthread workers let one process serve several LINE webhooks at once while
+others wait on Overpass / Neon I/O; the old default was a single sync worker.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+keepalive = 5
+
+# 不開 preload：app import 時會啟動 consent worker / postgres-init 背景執行緒，
+# fork 之後子行程不會帶著這些執行緒，改成每個 worker 自己 import 一次。
+preload_app = False
+
+# worker 心跳檔放在記憶體檔案系統：容器的 /tmp 常是 overlay/磁碟，fsync 卡住時 worker 會被誤判逾時
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
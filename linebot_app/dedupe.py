@@ -3,35 +3,44 @@ import json
 import logging
 import threading
 import time
+from collections import OrderedDict
 
 from linebot.models import MessageEvent, TextMessage, LocationMessage, PostbackEvent
 
 # === 防重複（簡單版：避免同一 webhook 在短時間內重複處理）===
 DEDUPE_WINDOW = int(os.getenv("DEDUPE_WINDOW", "10"))
 _DEDUPE_SIMPLE_LOCK = threading.Lock()
-_RECENT_EVENTS_SIMPLE = {}
+# key -> monotonic 時間；依插入時間排序，最舊的在最前面
+_RECENT_EVENTS_SIMPLE = OrderedDict()
+_DEDUPE_MAX_KEYS = 10000
 
 def is_duplicate_and_mark(key: str, window: int = DEDUPE_WINDOW) -> bool:
     """簡單防重：同一 key 在 window 秒內視為重複。
 
     這段邏輯保留給舊流程使用；下方另有更精準的事件去重（_event_type_and_key）。
     """
-    now = time.time()
+    now = time.monotonic()
     if not key:
         return False
     try:
         with _DEDUPE_SIMPLE_LOCK:
+            # 只從最前面清掉過期的（均攤 O(1)），遇到未過期的就停
+            cutoff = now - window
+            while _RECENT_EVENTS_SIMPLE:
+                oldest_ts = next(iter(_RECENT_EVENTS_SIMPLE.values()))
+                if oldest_ts >= cutoff:
+                    break
+                _RECENT_EVENTS_SIMPLE.popitem(last=False)
+
             ts = _RECENT_EVENTS_SIMPLE.get(key)
             if ts is not None and (now - ts) < window:
-                logging.info(f"🔁 skip duplicate: {key}")
+                logging.info("🔁 skip duplicate: %s", key)
                 return True
             _RECENT_EVENTS_SIMPLE[key] = now
-            # 輕量清理，避免 dict 無限成長
-            if len(_RECENT_EVENTS_SIMPLE) > 5000:
-                cutoff = now - window
-                for k, tstamp in list(_RECENT_EVENTS_SIMPLE.items()):
-                    if tstamp < cutoff:
-                        _RECENT_EVENTS_SIMPLE.pop(k, None)
+            _RECENT_EVENTS_SIMPLE.move_to_end(key)
+            # 突發流量時的硬上限，避免 dict 無限成長
+            if len(_RECENT_EVENTS_SIMPLE) > _DEDUPE_MAX_KEYS:
+                _RECENT_EVENTS_SIMPLE.popitem(last=False)
         return False
     except Exception:
         return False
@@ -87,7 +96,7 @@ def is_duplicate_and_mark_event(event, window: int = DEDUPE_WINDOW) -> bool:
         event_type, key = _event_type_and_key(event)
         duplicated = is_duplicate_and_mark(key, window=window)
         if duplicated:
-            logging.info(f"🔁 skip duplicate {event_type}: {key}")
+            logging.info("🔁 skip duplicate %s: %s", event_type, key)
         return duplicated
     except Exception as e:
         logging.error(f"is_duplicate_and_mark_event failed: {e}", exc_info=True)
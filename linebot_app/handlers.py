@@ -5,10 +5,12 @@ import sqlite3
 import threading
 import time
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from urllib.parse import quote, unquote, parse_qs
 from datetime import datetime
 
-from flask import request, abort
+from flask import request, abort, copy_current_request_context
 from linebot import LineBotApi, WebhookHandler
 from linebot.exceptions import InvalidSignatureError, LineBotApiError
 from linebot.models import (
@@ -18,13 +20,14 @@ from linebot.models import (
     PostbackEvent, PostbackAction,
 )
 
-from config import TW_TZ, LOC_MAX_CONCURRENCY
-from core.database import POSTGRES_ENABLED, _pg_connect, ANALYTICS_DB_PATH, _get_db, psycopg2
-from core.cache import _CACHE
+from config import TW_TZ, LOC_MAX_CONCURRENCY, LOC_QUERY_TIMEOUT_SEC, USER_STATE_LRU_SIZE, USER_STATE_TTL_SEC
+from core.database import POSTGRES_ENABLED, _pg_connect, ANALYTICS_DB_PATH, _get_db, psycopg2, log_search
+from core.cache import _CACHE, SimpleLRU, contrib_cache_key, contrib_cache_version, invalidate_contrib_cache
 from core.i18n import (
-    set_user_lang, get_user_lang, T, L, _localize_outgoing_messages,
+    set_user_lang, get_user_lang, resolve_lang, T, L, _localize_outgoing_messages,
 )
-from core.utils import norm_coord, haversine
+from core.utils import norm_coord, haversine, utc_now_str, bbox_bounds
+from core.geo import build_grid_index, grid_candidates, haversine_many
 from linebot_app.reply_tokens import CHANNEL_ACCESS_TOKEN, show_loading
 from linebot_app.dedupe import is_duplicate_and_mark_event
 from linebot_app.replies import (
@@ -61,10 +64,12 @@ _PUSH_LOCK = threading.Lock()
 PUSH_FALLBACK_DEDUPE_WINDOW = int(os.getenv("PUSH_FALLBACK_DEDUPE_WINDOW", "180"))
 
 # === 共用狀態 ===
-user_locations = {}
-pending_delete_confirm = {}
-user_search_count = {}
-user_loc_mode = {}  # 新增：記錄使用者目前查廁所模式（"normal" or "ai"）
+# 以使用者為 key 的狀態改成有上限的 LRU：長時間運作不會隨使用者數無限長大；
+# 值存 (ts, value)，超過 USER_STATE_TTL_SEC 沒更新也視為過期。
+# 被擠掉或過期的使用者只是回到預設（沒有上次位置 / normal 模式）
+user_locations = SimpleLRU(maxsize=USER_STATE_LRU_SIZE)
+user_search_count = SimpleLRU(maxsize=USER_STATE_LRU_SIZE)
+user_loc_mode = SimpleLRU(maxsize=USER_STATE_LRU_SIZE)  # 新增：記錄使用者目前查廁所模式（"normal" or "ai"）
 
 # 建議：高併發時避免競態
 _dict_lock = threading.Lock()
@@ -409,9 +414,96 @@ def _short_txt(s, n=60):
     except Exception:
         return s
 
-def create_toilet_flex_messages(toilets, uid=None, query_id=None):
-    indicators = build_feedback_index()
-    status_map = build_status_index()
+# === Flex 卡片固定內容（模組層級建一次，不在每張卡片重建）===
+# 資料來源顯示對照（中/英）
+_FLEX_SOURCE_LABEL = {
+    "public_csv": ("政府開放資料", "Government Open Data"),
+    "sheet": ("使用者新增", "User Added"),
+    "osm": ("OpenStreetMap", "OpenStreetMap"),
+    "user": ("使用者新增", "User Added"),
+    "favorite": ("我的最愛", "My Favorites"),
+}
+_FLEX_SOURCE_DEFAULT = ("其他來源", "Other source")
+
+# 狀態（中/英）與 emoji
+_FLEX_STATUS_EN = {
+    "恢復正常": "Back to normal",
+    "有人排隊": "Queue present",
+    "缺衛生紙": "No toilet paper",
+    "暫停使用": "Out of service",
+}
+_FLEX_STATUS_EMOJI = {"有人排隊": "🟡", "缺衛生紙": "🧻", "暫停使用": "⛔"}
+
+
+def _flex_info_line(text):
+    # 狀態/樓層/開放時間共用的小字樣式
+    return {"type": "text", "text": text, "size": "sm", "color": "#666666", "wrap": True}
+
+
+def _flex_button(action, primary=False):
+    return {"type": "button", "style": "primary" if primary else "secondary", "height": "sm", "action": action}
+
+
+# 回饋/狀態索引快取過期時各要查一次 Neon；查附近廁所時先在背景預抓，與搜尋同時進行
+_flex_index_pool = ThreadPoolExecutor(max_workers=2)
+
+# 推薦紀錄/分析事件只是寫入，不影響回覆內容：丟到背景執行，reply_token 不必等 Neon
+_log_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="query-log")
+
+
+def _prefetch_flex_indexes():
+    return _flex_index_pool.submit(build_feedback_index), _flex_index_pool.submit(build_status_index)
+
+
+def _collect_flex_indexes(futures, timeout=LOC_QUERY_TIMEOUT_SEC):
+    out = []
+    for fut in futures:
+        try:
+            out.append(fut.result(timeout=timeout))
+        except Exception as e:
+            # 預抓失敗就交給 create_toilet_flex_messages 自己重建
+            logging.warning("預抓 Flex 索引失敗：%s", e)
+            out.append(None)
+    return out
+
+
+# 回饋指示燈的格網索引：build_feedback_index 在 TTL 內回傳同一個 dict，
+# 索引跟著那個 dict 物件重建一次即可，不必每張卡片都把全部回饋座標算一遍距離。
+_INDICATOR_NEAR_M = 15
+_INDICATOR_GRID = {"src": None}
+
+
+def _indicator_grid(indicators):
+    global _INDICATOR_GRID
+    cached = _INDICATOR_GRID
+    if cached["src"] is indicators:
+        return cached
+    keys, lats, lons = [], [], []
+    for k in indicators:
+        try:
+            lat_f, lon_f = float(k[0]), float(k[1])
+        except Exception:
+            continue
+        keys.append(k)
+        lats.append(lat_f)
+        lons.append(lon_f)
+    cached = {
+        "src": indicators, "keys": keys, "lats": lats, "lons": lons,
+        "grid": build_grid_index(lats, lons, cell_deg=0.0005),
+    }
+    _INDICATOR_GRID = cached
+    return cached
+
+
+# 卡片網址裡的名稱/地址/座標多半是同一批熱門廁所，quote 結果直接記住
+_quote_cached = lru_cache(maxsize=4096)(quote)
+
+
+def create_toilet_flex_messages(toilets, uid=None, query_id=None, indicators=None, status_map=None):
+    if indicators is None:
+        indicators = build_feedback_index()
+    if status_map is None:
+        status_map = build_status_index()
 
     def _nearby_indicator(lat_s, lon_s, default=None):
         default = default or {"paper": "?", "access": "?", "avg": None}
@@ -421,21 +513,19 @@ def create_toilet_flex_messages(toilets, uid=None, query_id=None):
         if hit:
             return hit
 
-        # 再容許約 15 公尺內的回饋座標
+        # 再容許約 15 公尺內的回饋座標（只看格網鄰近格子；依原 dict 順序比較，平手時結果不變）
         try:
             lat_f = float(lat_s)
             lon_f = float(lon_s)
             best = None
             best_d = 999999
 
-            for (ilat, ilon), val in indicators.items():
-                try:
-                    d = haversine(lat_f, lon_f, float(ilat), float(ilon))
-                except Exception:
-                    continue
-
-                if d <= 15 and d < best_d:
-                    best = val
+            g = _indicator_grid(indicators)
+            cand = grid_candidates(g["grid"], *bbox_bounds(lat_f, lon_f, _INDICATOR_NEAR_M))
+            for i in sorted(cand):
+                d = haversine(lat_f, lon_f, g["lats"][i], g["lons"][i])
+                if d <= _INDICATOR_NEAR_M and d < best_d:
+                    best = indicators[g["keys"][i]]
                     best_d = d
 
             return best or default
@@ -443,22 +533,24 @@ def create_toilet_flex_messages(toilets, uid=None, query_id=None):
         except Exception:
             return default
 
-    # === 資料來源顯示對照（中/英）===
-    SOURCE_LABEL = {
-        "public_csv": ("政府開放資料", "Government Open Data"),
-        "sheet": ("使用者新增", "User Added"),
-        "osm": ("OpenStreetMap", "OpenStreetMap"),
-        "user": ("使用者新增", "User Added"),
-        "favorite": ("我的最愛", "My Favorites"),
-    }
-
-    # === 狀態（中/英）===
-    STATUS_EN = {
-        "恢復正常": "Back to normal",
-        "有人排隊": "Queue present",
-        "缺衛生紙": "No toilet paper",
-        "暫停使用": "Out of service",
-    }
+    # 每張卡片都相同的值只算一次；語言只查一次（L(uid, ...) 每次呼叫都會查一次 SQLite）
+    base = _base_url()
+    lang = resolve_lang(uid=uid)
+    # 網址上的 lang 參數沿用 _user_lang_q 規則：沒有 uid 時固定 zh
+    lang_q = lang if uid else "zh"
+
+    def _L(zh, en):
+        return T(zh, lang=lang, en=en)
+
+    no_addr_text = _L("（無地址，使用座標）", "(No address, using coordinates)")
+    nav_label = _L("導航", "Navigate")
+    view_fb_label = _L("查詢回饋", "View feedback")
+    leave_fb_label = _L("廁所回饋", "Leave feedback")
+    ai_label = _L("AI 回饋摘要", "AI summary")
+    remove_fav_label = _L("移除最愛", "Remove favorite")
+    add_fav_label = _L("加入最愛", "Add favorite")
+    uid_q = quote(uid or '')
+    qid_q = quote(query_id or '')
 
     bubbles = []
     for toilet in toilets[:5]:
@@ -466,7 +558,7 @@ def create_toilet_flex_messages(toilets, uid=None, query_id=None):
 
         lat_s = norm_coord(toilet['lat'])
         lon_s = norm_coord(toilet['lon'])
-        addr_text = toilet.get('address') or L(uid, "（無地址，使用座標）", "(No address, using coordinates)")
+        addr_text = toilet.get('address') or no_addr_text
 
         toilet_id = _make_toilet_id(toilet)
         # -------------------------
@@ -478,12 +570,12 @@ def create_toilet_flex_messages(toilets, uid=None, query_id=None):
 
             zh_title = f"{ph}（附近）廁所" if ph else "（未命名）廁所"
             en_title = f"Toilet near {ph}" if ph else "(Unnamed) Toilet"
-            title = L(uid, zh_title, en_title)
+            title = _L(zh_title, en_title)
 
         # === 來源文字（小小顯示）===
         source_type = toilet.get("type", "")
-        src_zh_en = SOURCE_LABEL.get(source_type, ("其他來源", "Other source"))
-        source_text = L(uid, src_zh_en[0], src_zh_en[1])
+        src_zh_en = _FLEX_SOURCE_LABEL.get(source_type, _FLEX_SOURCE_DEFAULT)
+        source_text = _L(src_zh_en[0], src_zh_en[1])
 
         # 只讀三個欄位（可能為空）
         lvl   = (toilet.get("level") or "").strip()
@@ -495,41 +587,25 @@ def create_toilet_flex_messages(toilets, uid=None, query_id=None):
         st_obj = status_map.get((lat_s, lon_s))
         if st_obj and st_obj.get("status"):
             st = st_obj["status"]
-            emoji = "🟡" if st == "有人排隊" else ("🧻" if st == "缺衛生紙" else ("⛔" if st == "暫停使用" else "✅"))
-            st_en = STATUS_EN.get(st, st)
+            emoji = _FLEX_STATUS_EMOJI.get(st, "✅")
+            st_en = _FLEX_STATUS_EN.get(st, st)
 
-            extra_lines.append({
-                "type": "text",
-                "text": _short_txt(L(uid, f"{emoji} 狀態：{st}", f"{emoji} Status: {st_en}")),
-                "size": "sm", "color": "#666666", "wrap": True
-            })
+            extra_lines.append(_flex_info_line(
+                _short_txt(_L(f"{emoji} 狀態：{st}", f"{emoji} Status: {st_en}"))
+            ))
 
         if lvl or pos:
             if lvl and pos and (lvl.strip().lower() != pos.strip().lower()):
-                extra_lines.append({
-                    "type": "text",
-                    "text": _short_txt(L(uid, f"🏷 樓層：{lvl}", f"🏷 Floor: {lvl}")),
-                    "size": "sm", "color": "#666666", "wrap": True
-                })
-                extra_lines.append({
-                    "type": "text",
-                    "text": _short_txt(L(uid, f"🧭 位置：{pos}", f"🧭 Location: {pos}")),
-                    "size": "sm", "color": "#666666", "wrap": True
-                })
+                extra_lines.append(_flex_info_line(_short_txt(_L(f"🏷 樓層：{lvl}", f"🏷 Floor: {lvl}"))))
+                extra_lines.append(_flex_info_line(_short_txt(_L(f"🧭 位置：{pos}", f"🧭 Location: {pos}"))))
             else:
                 val = pos or lvl
-                extra_lines.append({
-                    "type": "text",
-                    "text": _short_txt(L(uid, f"🧭 位置/樓層：{val}", f"🧭 Location/Floor: {val}")),
-                    "size": "sm", "color": "#666666", "wrap": True
-                })
+                extra_lines.append(_flex_info_line(
+                    _short_txt(_L(f"🧭 位置/樓層：{val}", f"🧭 Location/Floor: {val}"))
+                ))
 
         if hours:
-            extra_lines.append({
-                "type": "text",
-                "text": _short_txt(L(uid, f"🕒 開放：{hours}", f"🕒 Hours: {hours}")),
-                "size": "sm", "color": "#666666", "wrap": True
-            })
+            extra_lines.append(_flex_info_line(_short_txt(_L(f"🕒 開放：{hours}", f"🕒 Hours: {hours}"))))
 
         # 指示燈文字（paper/access/avg）
         ind = _nearby_indicator(lat_s, lon_s, {"paper": "?", "access": "?", "avg": None})
@@ -539,80 +615,80 @@ def create_toilet_flex_messages(toilets, uid=None, query_id=None):
 
         # 🧻 paper 顯示
         if ind.get("paper") == "有":
-            paper_text = L(uid, "🧻有", "🧻Yes")
+            paper_text = _L("🧻有", "🧻Yes")
         elif ind.get("paper") == "沒有":
-            paper_text = L(uid, "🧻無", "🧻No")
+            paper_text = _L("🧻無", "🧻No")
         else:
             paper_text = "🧻—"
 
         # ♿ access 顯示
         if ind.get("access") == "有":
-            access_text = L(uid, "♿有", "♿Yes")
+            access_text = _L("♿有", "♿Yes")
         elif ind.get("access") == "沒有":
-            access_text = L(uid, "♿無", "♿No")
+            access_text = _L("♿無", "♿No")
         else:
             access_text = "♿—"
 
-        # 按鈕
-        base = _base_url()
-
+        # 按鈕（標題在導航/回饋/最愛三處網址都要用，只 quote 一次）
+        title_q = _quote_cached(title)
         nav_url = (
             f"{base}/go_to_toilet"
-            f"?qid={quote(query_id or '')}"
-            f"&uid={quote(uid or '')}"
-            f"&tid={quote(toilet_id)}"
-            f"&lat={quote(lat_s)}"
-            f"&lon={quote(lon_s)}"
-            f"&name={quote(title)}"
+            f"?qid={qid_q}"
+            f"&uid={uid_q}"
+            f"&tid={_quote_cached(toilet_id)}"
+            f"&lat={_quote_cached(lat_s)}"
+            f"&lon={_quote_cached(lon_s)}"
+            f"&name={title_q}"
         )
 
         actions.append({
             "type": "uri",
-            "label": L(uid, "導航", "Navigate"),
+            "label": nav_label,
             "uri": nav_url
         })
 
         actions.append({
             "type": "uri",
-            "label": L(uid, "查詢回饋", "View feedback"),
-            "uri": _append_uid_lang(f"{base}/toilet_feedback_by_coord/{lat_s}/{lon_s}", uid, _user_lang_q(uid))
+            "label": view_fb_label,
+            "uri": _append_uid_lang(f"{base}/toilet_feedback_by_coord/{lat_s}/{lon_s}", uid, lang_q)
         })
 
         addr_raw = toilet.get('address') or ""
-        addr_param = quote(addr_raw or "-")
+        addr_q = _quote_cached(addr_raw)
+        addr_param = addr_q or "-"
         actions.append({
             "type": "uri",
-            "label": L(uid, "廁所回饋", "Leave feedback"),
+            "label": leave_fb_label,
             "uri": (
                 f"{base}/feedback_form/"
-                f"{quote(title)}/{addr_param}"
-                f"?lat={lat_s}&lon={lon_s}&address={quote(addr_raw)}"
+                f"{title_q}/{addr_param}"
+                f"?lat={lat_s}&lon={lon_s}&address={addr_q}"
             )
         })
 
         ai_uri = f"{base}/ai_feedback_summary_page/{lat_s}/{lon_s}" + (f"?uid={quote(uid)}" if uid else "")
         actions.append({
             "type": "uri",
-            "label": L(uid, "AI 回饋摘要", "AI summary"),
+            "label": ai_label,
             "uri": ai_uri
         })
 
         if toilet.get("type") == "favorite" and uid:
             actions.append({
                 "type": "postback",
-                "label": L(uid, "移除最愛", "Remove favorite"),
-                "data": f"remove_fav:{quote(title)}:{lat_s}:{lon_s}"
+                "label": remove_fav_label,
+                "data": f"remove_fav:{title_q}:{lat_s}:{lon_s}"
             })
         elif toilet.get("type") not in ["user", "favorite"] and uid:
             actions.append({
                 "type": "postback",
-                "label": L(uid, "加入最愛", "Add favorite"),
-                "data": f"add:{quote(title)}:{lat_s}:{lon_s}"
+                "label": add_fav_label,
+                "data": f"add:{title_q}:{lat_s}:{lon_s}"
             })
 
         # === 主體內容（加上資料來源）===
         dist = int(toilet.get('distance', 0) or 0)
-        dist_text = L(uid, f"{dist} 公尺", f"{dist} m")
+        dist_text = _L(f"{dist} 公尺", f"{dist} m")
 
         body_contents = [
             {"type": "text", "text": title, "weight": "bold", "size": "lg", "wrap": True},
@@ -622,7 +698,7 @@ def create_toilet_flex_messages(toilets, uid=None, query_id=None):
             {"type": "text", "text": dist_text, "size": "sm", "color": "#999999"},
             {
                 "type": "text",
-                "text": L(uid, f"資料來源：{source_text}", f"Source: {source_text}"),
+                "text": _L(f"資料來源：{source_text}", f"Source: {source_text}"),
                 "size": "xs",
                 "color": "#AAAAAA",
                 "wrap": True
@@ -640,11 +716,8 @@ def create_toilet_flex_messages(toilets, uid=None, query_id=None):
                 "type": "box",
                 "layout": "vertical",
                 "spacing": "sm",
-                "contents": [
-                    {"type": "button", "style": "primary", "height": "sm", "action": actions[0]}
-                ] + [
-                    {"type": "button", "style": "secondary", "height": "sm", "action": a}
-                    for a in actions[1:]
+                "contents": [_flex_button(actions[0], primary=True)] + [
+                    _flex_button(a) for a in actions[1:]
                 ]
             }
         }
@@ -653,11 +726,26 @@ def create_toilet_flex_messages(toilets, uid=None, query_id=None):
 
     return {"type": "carousel", "contents": bubbles}
 
+# 「我的貢獻」清單會在同一輪互動被讀好幾次（卡片、使用回顧、刪除確認後重抓），
+# 短暫放在 _CACHE，並記下讀取當下的版本號（core.cache.contrib_cache_version）；
+# 使用者新增/刪除、管理端審核都會更新 cache.db 的版本號，其他 worker 命中前比對得到。
+CONTRIB_CACHE_TTL = int(os.getenv("CONTRIB_CACHE_TTL", "60"))
+
 def get_user_contributions(uid):
     """List current user's submitted toilets from Neon."""
     items = []
     if not uid or not POSTGRES_ENABLED:
         return items
+
+    cache_key = contrib_cache_key(uid)
+    version = contrib_cache_version(uid)
+    try:
+        hit = _CACHE.get(cache_key)
+    except Exception:
+        hit = None
+    if hit and version is not None and hit[1] == version and time.time() - hit[0] < CONTRIB_CACHE_TTL:
+        return [dict(it) for it in hit[2]]
+
     try:
         conn = _pg_connect()
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
@@ -682,6 +770,8 @@ def get_user_contributions(uid):
                 "created": ts.isoformat() if hasattr(ts, "isoformat") else str(ts or ""),
                 "verification_status": status,
             })
+        if version is not None:
+            _CACHE.set(cache_key, (time.time(), version, [dict(it) for it in items]))
         return items
     except Exception as e:
         logging.error(f"讀取 Neon 我的貢獻失敗：{e}", exc_info=True)
@@ -741,8 +831,8 @@ def delete_my_contribution(uid, toilet_id):
         row = cur.fetchone()
         conn.commit()
         conn.close()
-        try: _CACHE.clear()
-        except Exception: pass
+        # 只影響這位使用者的貢獻清單，不必清掉其他人的快取
+        invalidate_contrib_cache(uid)
         if row:
             return True, "deleted"
         return False, "not_found_or_permission_denied"
@@ -750,9 +840,46 @@ def delete_my_contribution(uid, toilet_id):
         logging.error(f"delete_my_contribution failed: {e}", exc_info=True)
         return False, "exception"
 
+# Webhook 先驗簽、立刻回 200，事件交給背景執行緒處理（仍只用 reply_token 回覆，不改成 push）。
+# 這樣搜尋/Overpass 期間不會佔住 gunicorn 的請求執行緒，LINE 端也不會等到逾時。
+# 背景改成多條單執行緒佇列，依使用者 hash 分配：同一位使用者的事件（先傳位置再切模式）
+# 一定照到達順序處理，不會在 user_locations / user_loc_mode 上互相搶寫。
+# 代價是同一條佇列裡前一個慢查詢會讓後面其他使用者多等一下。
+_WEBHOOK_ASYNC = os.getenv("WEBHOOK_ASYNC", "1") == "1"
+_webhook_lanes = [
+    ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"webhook-{i}")
+    for i in range(max(1, int(os.getenv("WEBHOOK_WORKERS", "8"))))
+]
+
+
+def _webhook_lane(body):
+    """以第一個事件的來源（userId，沒有時用 groupId/roomId）挑佇列。
+    同一包 webhook 的事件本來就依序處理；一包裡混了多位使用者時只保證第一位的順序。"""
+    try:
+        events = json.loads(body).get("events") or []
+        src = (events[0].get("source") or {}) if events else {}
+        key = src.get("userId") or src.get("groupId") or src.get("roomId") or ""
+    except Exception:
+        key = ""
+    return _webhook_lanes[hash(key) % len(_webhook_lanes)]
+
+
+def _handle_webhook_body(body, signature):
+    try:
+        handler.handle(body, signature)
+    except Exception as e:
+        logging.error("❌ 背景處理 webhook 失敗: %s", e, exc_info=True)
+
+
 def callback():
     signature = request.headers.get("X-Line-Signature")
     body = request.get_data(as_text=True)
+    if _WEBHOOK_ASYNC:
+        if not handler.parser.signature_validator.validate(body, signature or ""):
+            abort(400)
+        # 帶著 request context 走，_base_url() 沒設 PUBLIC_URL 時仍可用 request.url_root
+        _webhook_lane(body).submit(copy_current_request_context(_handle_webhook_body), body, signature)
+        return "OK"
     try:
         handler.handle(body, signature)
     except InvalidSignatureError:
@@ -762,21 +889,32 @@ def callback():
 def home():
     return "Toilet bot is running!", 200
 
+def _user_state_get(store, uid, default=None):
+    """呼叫端需持有 _dict_lock；過期的狀態順手移除並回傳預設值。"""
+    hit = store.get(uid)
+    if hit is None:
+        return default
+    ts, value = hit
+    if time.time() - ts > USER_STATE_TTL_SEC:
+        store.pop(uid, None)
+        return default
+    return value
+
 def set_user_location(uid, latlon):
     with _dict_lock:
-        user_locations[uid] = latlon
+        user_locations.set(uid, (time.time(), latlon))
 
 def get_user_location(uid):
     with _dict_lock:
-        return user_locations.get(uid)
+        return _user_state_get(user_locations, uid)
 
 def set_user_loc_mode(uid, mode):
     with _dict_lock:
-        user_loc_mode[uid] = mode
+        user_loc_mode.set(uid, (time.time(), mode))
 
 def get_user_loc_mode(uid):
     with _dict_lock:
-        return user_loc_mode.get(uid, "normal")
+        return _user_state_get(user_loc_mode, uid, "normal")
 
 def handle_text(event):
     if _too_old_to_reply(event):
@@ -959,8 +1097,9 @@ def handle_text(event):
             loc = get_user_location(uid)
             if loc:
                 lat, lon = loc
-                for f in favs:
-                    f["distance"] = haversine(lat, lon, f["lat"], f["lon"])
+                dists = haversine_many(lat, lon, [f["lat"] for f in favs], [f["lon"] for f in favs])
+                for f, d in zip(favs, dists):
+                    f["distance"] = d
             msg = create_toilet_flex_messages(favs, uid=uid)
             reply_messages.append(FlexSendMessage(L(uid, "我的最愛", "My Favorites"), msg))
 
@@ -1044,17 +1183,9 @@ def handle_location(event):
     lat = event.message.latitude
     lon = event.message.longitude
 
-    # 記錄查詢次數（寫 DB）
+    # 記錄查詢次數（緩衝後批次寫 DB）
     try:
-        conn = _get_db()
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO search_log (user_id, lat, lon, ts) VALUES (?,?,?,?)",
-            (uid, norm_coord(lat), norm_coord(lon),
-             datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"))
-        )
-        conn.commit()
-        conn.close()
+        log_search(uid, norm_coord(lat), norm_coord(lon), utc_now_str())
     except Exception as e:
         logging.warning(f"記錄查詢次數失敗: {e}")
 
@@ -1079,31 +1210,36 @@ def handle_location(event):
     try:
         query_id = make_query_id()
 
+        index_futures = _prefetch_flex_indexes()
         toilets = build_nearby_toilets(uid, lat, lon)
         elapsed_ms = int((time.time() - start_ts) * 1000)
 
         if toilets:
-            log_recommendation_results(
+            # 背景執行緒各拿一份淺拷貝（log 會補算分數欄位），不與下面組 Flex 共用同一批 dict
+            _log_pool.submit(
+                log_recommendation_results,
                 query_id=query_id,
                 uid=uid,
                 user_lat=lat,
                 user_lon=lon,
-                toilets=toilets,
+                toilets=[dict(t) for t in toilets],
                 limit=5
             )
-            log_shadow_recommendation_results(
+            _log_pool.submit(
+                log_shadow_recommendation_results,
                 query_id=query_id,
                 uid=uid,
                 user_lat=lat,
                 user_lon=lon,
-                toilets=toilets,
+                toilets=[dict(t) for t in toilets],
                 limit=5
             )
 
         elapsed_ms = int((time.time() - start_ts) * 1000)
 
         if elapsed_ms > 0:
-            log_analytics_event(
+            _log_pool.submit(
+                log_analytics_event,
                 user_id=uid,
                 event_type="location_query",
                 result_count=len(toilets or []),
@@ -1116,7 +1252,10 @@ def handle_location(event):
 
         if toilets:
             # 產出廁所 carousel，並帶入 query_id，讓導航點擊可回連到本次推薦紀錄
-            msg = create_toilet_flex_messages(toilets, uid=uid, query_id=query_id)
+            indicators, status_map = _collect_flex_indexes(index_futures)
+            msg = create_toilet_flex_messages(
+                toilets, uid=uid, query_id=query_id, indicators=indicators, status_map=status_map
+            )
 
             # 看目前是一般模式還是 AI 模式
             mode = get_user_loc_mode(uid)
@@ -1402,8 +1541,9 @@ def handle_postback(event):
                 loc = get_user_location(uid)
                 if loc:
                     lat, lon = loc
-                    for f in favs:
-                        f["distance"] = haversine(lat, lon, f["lat"], f["lon"])
+                    dists = haversine_many(lat, lon, [f["lat"] for f in favs], [f["lon"] for f in favs])
+                    for f, d in zip(favs, dists):
+                        f["distance"] = d
 
                 msg = create_toilet_flex_messages(favs, uid=uid)
                 safe_reply(event, FlexSendMessage(L(uid, "我的最愛", "My Favorites"), msg))
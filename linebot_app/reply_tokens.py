@@ -1,13 +1,15 @@
 import os
 import logging
 import threading
+from collections import OrderedDict
 
-import requests
+from core.http import http_session
 
 # === reply_token 使用記錄（新增） ===
-_USED_REPLY_TOKENS = set()
+# 依使用順序保存；超過上限只淘汰最舊的，不整個清空（清空會讓剛用過的 token 又被視為可用）
+_USED_REPLY_TOKENS = OrderedDict()
 _USED_REPLY_LOCK = threading.Lock()
-_MAX_USED_TOKENS = 50000  # 防止集合無限成長
+_MAX_USED_TOKENS = 50000  # 防止無限成長
 CHANNEL_ACCESS_TOKEN = os.getenv("LINE_CHANNEL_ACCESS_TOKEN")
 
 def show_loading(uid, seconds=10):
@@ -21,17 +23,24 @@ def show_loading(uid, seconds=10):
         "loadingSeconds": max(5, min(seconds, 60))
     }
 
-    resp = requests.post(url, headers=headers, json=payload)
-    logging.info(f"[loading] {resp.status_code} {resp.text}")
+    # 每則定位訊息都會先呼叫：共用連線池，並設逾時避免卡住整個處理流程
+    try:
+        resp = http_session.post(url, headers=headers, json=payload, timeout=5)
+    except Exception as e:
+        # 載入動畫只是提示，失敗不影響後續回覆
+        logging.warning("[loading] failed: %s", e)
+        return
+    logging.info("[loading] %s %s", resp.status_code, resp.text)
 
 def _mark_token_used(tok: str):
     try:
         if not tok:
             return
         with _USED_REPLY_LOCK:
-            _USED_REPLY_TOKENS.add(tok)
-            if len(_USED_REPLY_TOKENS) > _MAX_USED_TOKENS:
-                _USED_REPLY_TOKENS.clear()  # 簡單清理
+            _USED_REPLY_TOKENS[tok] = None
+            _USED_REPLY_TOKENS.move_to_end(tok)
+            while len(_USED_REPLY_TOKENS) > _MAX_USED_TOKENS:
+                _USED_REPLY_TOKENS.popitem(last=False)
     except Exception:
         pass
 
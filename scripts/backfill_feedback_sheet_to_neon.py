@@ -1,10 +1,12 @@
 import argparse
 import json
+import math
 import os
 from datetime import datetime
 
 import gspread
 import psycopg2
+import psycopg2.extras
 from dotenv import load_dotenv
 
 
@@ -94,28 +96,51 @@ def list_table_columns(conn):
         return {r[0] for r in cur.fetchall()}
 
 
-def duplicate_exists(conn, item):
+_DUP_TOL = 0.000001
+
+
+def _dup_bucket(lat, name, address, rating_text):
+    # 緯度以 1e-6 為格取 floor 當 bucket；相差 <= 1e-6 的兩點最多落在相鄰格，
+    # 查詢時看前後三格再逐一比 ABS <= 1e-6，才能和原本的 SQL 容差條件一致
+    # （直接 round 到 6 位會在格線兩側誤判，例如 25.0000004 與 25.0000006）
+    return (name or "", address or "", rating_text or "", math.floor(float(lat) / _DUP_TOL))
+
+
+class ExistingFeedbacks:
+    """既有回饋的記憶體索引，取代每筆候選資料各打一次 SELECT 的重複檢查。"""
+
+    def __init__(self):
+        self._buckets = {}
+
+    def add(self, lat, lon, name, address, rating_text):
+        key = _dup_bucket(lat, name, address, rating_text)
+        self._buckets.setdefault(key, []).append((float(lat), float(lon)))
+
+    def contains(self, lat, lon, name, address, rating_text):
+        lat, lon = float(lat), float(lon)
+        name, address, rating_text, b = _dup_bucket(lat, name, address, rating_text)
+        for nb in (b - 1, b, b + 1):
+            for elat, elon in self._buckets.get((name, address, rating_text, nb), ()):
+                if abs(elat - lat) <= _DUP_TOL and abs(elon - lon) <= _DUP_TOL:
+                    return True
+        return False
+
+
+def load_existing_keys(conn):
+    """一次載入既有回饋的比對資料，避免每筆候選資料都打一次 SELECT。"""
+    existing = ExistingFeedbacks()
     with conn.cursor() as cur:
         cur.execute("""
-            SELECT id
+            SELECT lat, lon, COALESCE(name, ''), COALESCE(address, ''), COALESCE(rating::text, '')
             FROM toilet_feedbacks
-            WHERE ABS(lat - %s) <= 0.000001
-              AND ABS(lon - %s) <= 0.000001
-              AND COALESCE(name, '') = %s
-              AND COALESCE(address, '') = %s
-              AND COALESCE(rating::text, '') = %s
-            LIMIT 1
-        """, (
-            item["lat"],
-            item["lon"],
-            item["name"],
-            item["address"],
-            str(item["rating"]),
-        ))
-        return cur.fetchone() is not None
+            WHERE lat IS NOT NULL AND lon IS NOT NULL
+        """)
+        for r in cur.fetchall():
+            existing.add(*r)
+    return existing
 
 
-def insert_item(conn, item, columns):
+def _insertable(item, columns):
     insertable = {
         "name": item["name"],
         "address": item["address"],
@@ -133,17 +158,28 @@ def insert_item(conn, item, columns):
     if "created_at" in columns and item.get("created_at"):
         insertable["created_at"] = item["created_at"]
 
-    insertable = {k: v for k, v in insertable.items() if k in columns}
+    return {k: v for k, v in insertable.items() if k in columns}
+
+
+def insert_item(conn, item, columns):
+    insert_items(conn, [item], columns)
+
 
-    keys = list(insertable.keys())
-    placeholders = ", ".join(["%s"] * len(keys))
-    sql = f"""
-        INSERT INTO toilet_feedbacks ({", ".join(keys)})
-        VALUES ({placeholders})
-    """
+def insert_items(conn, items, columns, page_size=500):
+    """批次寫入：欄位組合相同的資料用 execute_values 合併成多列 INSERT，減少來回次數。"""
+    groups = {}
+    for item in items:
+        insertable = _insertable(item, columns)
+        keys = tuple(insertable.keys())
+        groups.setdefault(keys, []).append([insertable[k] for k in keys])
 
     with conn.cursor() as cur:
-        cur.execute(sql, [insertable[k] for k in keys])
+        for keys, rows in groups.items():
+            sql = f"""
+                INSERT INTO toilet_feedbacks ({", ".join(keys)})
+                VALUES %s
+            """
+            psycopg2.extras.execute_values(cur, sql, rows, page_size=page_size)
 
 
 def collect_rows_from_worksheet(ws):
@@ -267,12 +303,17 @@ def main():
     conn = psycopg2.connect(db_url)
     try:
         columns = list_table_columns(conn)
+        existing = load_existing_keys(conn)
+        pending = []
         for item in all_items:
-            if duplicate_exists(conn, item):
+            key = (item["lat"], item["lon"], item["name"], item["address"], str(item["rating"]))
+            if existing.contains(*key):
                 skipped += 1
                 continue
-            insert_item(conn, item, columns)
-            inserted += 1
+            pending.append(item)
+            existing.add(*key)
+        insert_items(conn, pending, columns)
+        inserted = len(pending)
 
         conn.commit()
         print(f"Inserted: {inserted}")
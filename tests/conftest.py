@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 讓 tests/ 下可以直接 import core / toilet 等頂層套件
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,40 @@
+import importlib.util
+import os
+
+import pytest
+
+pytest.importorskip("gspread")
+pytest.importorskip("psycopg2")
+pytest.importorskip("dotenv")
+
+_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "backfill_feedback_sheet_to_neon.py")
+_spec = importlib.util.spec_from_file_location("backfill_feedback_sheet_to_neon", _SCRIPT)
+backfill = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(backfill)
+
+
+def _existing(*rows):
+    e = backfill.ExistingFeedbacks()
+    for r in rows:
+        e.add(*r)
+    return e
+
+
+def test_tolerance_across_rounding_boundary():
+    # round(…, 6) 會把這兩點分到 25.0 / 25.000001；原本 SQL 的 ABS <= 1e-6 視為重複
+    e = _existing((25.0000004, 121.5, "A", "addr", "3"))
+    assert e.contains(25.0000006, 121.5, "A", "addr", "3")
+    assert e.contains(24.9999995, 121.5000009, "A", "addr", "3")
+
+
+def test_outside_tolerance_is_not_duplicate():
+    e = _existing((25.0000004, 121.5, "A", "addr", "3"))
+    assert not e.contains(25.0000016, 121.5, "A", "addr", "3")
+    assert not e.contains(25.0000004, 121.500002, "A", "addr", "3")
+
+
+def test_text_fields_must_match():
+    e = _existing((25.0, 121.5, "A", "addr", "3"))
+    assert not e.contains(25.0, 121.5, "A", "addr", "4")
+    assert not e.contains(25.0, 121.5, "B", "addr", "3")
+    assert e.contains(25.0, 121.5, "A", "addr", "3")
@@ -0,0 +1,53 @@
+import sqlite3
+import threading
+
+import pytest
+
+from core import database
+
+
+@pytest.fixture
+def cache_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "CACHE_DB_PATH", str(tmp_path / "cache.db"))
+    database.create_cache_db()
+    yield database.CACHE_DB_PATH
+    database._drop_cache_conn()
+
+
+def _version_in_thread(name):
+    # 每個執行緒各自一條 cache.db 連線，等同另一個 worker 讀取
+    out = []
+    t = threading.Thread(target=lambda: (out.append(database.shared_cache_version(name)), database._drop_cache_conn()))
+    t.start()
+    t.join()
+    return out[0]
+
+
+def test_unknown_name_starts_at_zero(cache_db):
+    assert database.shared_cache_version("fav:U1") == 0
+
+
+def test_bump_returns_new_version_and_is_seen_by_other_connections(cache_db):
+    assert database.bump_shared_cache_version("fav:U1") == 1
+    assert database.bump_shared_cache_version("fav:U1") == 2
+    assert database.shared_cache_version("fav:U1") == 2
+    assert _version_in_thread("fav:U1") == 2
+    with sqlite3.connect(cache_db) as other:
+        assert other.execute("SELECT version FROM cache_versions WHERE name = ?", ("fav:U1",)).fetchone()[0] == 2
+    # 不同 key 互不影響
+    assert database.shared_cache_version("fav:U2") == 0
+
+
+def test_bump_from_other_connection_is_visible(cache_db):
+    assert database.shared_cache_version("status") == 0
+    with sqlite3.connect(cache_db) as other:
+        other.execute("INSERT INTO cache_versions (name, version) VALUES ('status', 5)")
+    assert database.shared_cache_version("status") == 5
+
+
+def test_unreadable_db_reports_none(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "CACHE_DB_PATH", str(tmp_path / "missing" / "cache.db"))
+    database._drop_cache_conn()
+    assert database.shared_cache_version("fav:U1") is None
+    assert database.bump_shared_cache_version("fav:U1") is None
+    database._drop_cache_conn()
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from core import geo
+from core.utils import bbox_bounds, haversine
+
+
+def _points(n=3000, seed=7):
+    rnd = random.Random(seed)
+    lats = [25.03 + rnd.uniform(-0.05, 0.05) for _ in range(n)]
+    lons = [121.56 + rnd.uniform(-0.05, 0.05) for _ in range(n)]
+    # 壞座標不應入格，也不應出現在結果
+    lats[10] = float("nan")
+    lons[20] = float("nan")
+    return lats, lons
+
+
+def _grid_hits(grid, lats, lons, lat, lon, radius):
+    cand = geo.grid_candidates(grid, *bbox_bounds(lat, lon, radius))
+    return sorted(int(i) for i in cand if haversine(lat, lon, lats[i], lons[i]) <= radius)
+
+
+def _brute_hits(lats, lons, lat, lon, radius):
+    return sorted(i for i in range(len(lats)) if haversine(lat, lon, lats[i], lons[i]) <= radius)
+
+
+QUERIES = [(25.03, 121.56, 200), (25.05, 121.53, 500), (25.0, 121.6, 1500), (24.99, 121.51, 800)]
+
+
+@pytest.mark.parametrize("lat,lon,radius", QUERIES)
+def test_grid_list_matches_brute_force(lat, lon, radius):
+    lats, lons = _points()
+    grid = geo.build_grid_index(lats, lons)
+    assert _grid_hits(grid, lats, lons, lat, lon, radius) == _brute_hits(lats, lons, lat, lon, radius)
+
+
+@pytest.mark.parametrize("lat,lon,radius", QUERIES)
+def test_grid_numpy_matches_brute_force(lat, lon, radius):
+    np = pytest.importorskip("numpy")
+    if geo.np is None:
+        pytest.skip("core.geo loaded without numpy")
+    lats, lons = _points()
+    grid = geo.build_grid_index(np.asarray(lats), np.asarray(lons))
+    assert _grid_hits(grid, lats, lons, lat, lon, radius) == _brute_hits(lats, lons, lat, lon, radius)
+
+
+def test_grid_skips_nan_rows():
+    lats, lons = _points(n=50)
+    grid = geo.build_grid_index(lats, lons)
+    indexed = {int(i) for rows in grid["cells"].values() for i in rows}
+    assert 10 not in indexed and 20 not in indexed
+    assert len(indexed) == 48
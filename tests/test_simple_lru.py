@@ -0,0 +1,27 @@
+from core.cache import SimpleLRU
+
+
+def test_item_assignment_enforces_maxsize():
+    c = SimpleLRU(maxsize=3)
+    for i in range(10):
+        c[i] = i
+    assert list(c.keys()) == [7, 8, 9]
+
+
+def test_set_and_assignment_share_eviction_order():
+    c = SimpleLRU(maxsize=2)
+    c.set("a", 1)
+    c["b"] = 2
+    c["a"] = 3  # 覆寫也算最近使用
+    c.set("c", 4)
+    assert list(c.items()) == [("a", 3), ("c", 4)]
+
+
+def test_get_refreshes_recency():
+    c = SimpleLRU(maxsize=2)
+    c["a"] = 1
+    c["b"] = 2
+    assert c.get("a") == 1
+    c["c"] = 3
+    assert "a" in c and "b" not in c
+    assert c.get("missing", "x") == "x"
@@ -1,14 +1,17 @@
 import os
-import csv
+import math
 import time
 import re
 import logging
 from difflib import SequenceMatcher
 
+from core.geo import build_grid_index, grid_candidates
+from core.utils import bbox_bounds
+
 POSTGRES_ENABLED = False
 _pg_connect = None
 psycopg2 = None
-TOILETS_FILE_PATH = None
+load_public_csv = None
 geocode_address = None
 haversine = None
 _in_bbox = None
@@ -17,16 +20,16 @@ def configure_auto_verify(
     postgres_enabled,
     pg_connect,
     psycopg2_module,
-    toilets_file_path,
+    load_public_csv_func,
     geocode_address_func,
     haversine_func,
     in_bbox_func,
 ):
-    global POSTGRES_ENABLED, _pg_connect, psycopg2, TOILETS_FILE_PATH, geocode_address, haversine, _in_bbox
+    global POSTGRES_ENABLED, _pg_connect, psycopg2, load_public_csv, geocode_address, haversine, _in_bbox
     POSTGRES_ENABLED = postgres_enabled
     _pg_connect = pg_connect
     psycopg2 = psycopg2_module
-    TOILETS_FILE_PATH = toilets_file_path
+    load_public_csv = load_public_csv_func
     geocode_address = geocode_address_func
     haversine = haversine_func
     _in_bbox = in_bbox_func
@@ -115,7 +118,7 @@ def _spatial_context_signal(lat, lon, context=None, exclude_id=None, radius_m=No
     nearest = None
     try:
         lat_f = float(lat); lon_f = float(lon)
-        for r in context.get("items") or []:
+        for r in _context_candidates(context, lat_f, lon_f, radius_m):
             try:
                 if exclude_id is not None and str(r.get("id")) == str(exclude_id) and (r.get("source") in ("neon", "user_toilets", "user_added")):
                     continue
@@ -197,6 +200,42 @@ def _is_test_or_garbage_name(name):
     return s in garbage
 
 
+# public_toilets.csv 直接沿用查詢端已解析好的欄式快取，不再自己重讀、重轉一次；
+# 這裡只記住由哪一版快取轉出的 items，CSV 換版時快取整包替換就會重建
+_PUBLIC_CSV_ITEMS = {"cache": None, "items": []}
+
+
+def _public_csv_items():
+    global _PUBLIC_CSV_ITEMS
+    try:
+        cache = load_public_csv()
+        cached = _PUBLIC_CSV_ITEMS
+        if cached["cache"] is cache:
+            return cached["items"]
+        items = []
+        for number, name, address, lat, lon in zip(
+            cache["number"], cache["name"], cache["address"], cache["lat"], cache["lon"]
+        ):
+            lat = float(lat)
+            lon = float(lon)
+            if not (math.isfinite(lat) and math.isfinite(lon)):
+                continue
+            items.append({
+                "source": "public_csv",
+                "id": number or "",
+                "name": name or "",
+                "address": address or "",
+                "lat": lat,
+                "lon": lon,
+                "verification_status": "approved"
+            })
+        _PUBLIC_CSV_ITEMS = {"cache": cache, "items": items}
+        return items
+    except Exception as e:
+        logging.warning("_build_auto_verify_context public_csv failed: %s", e)
+        return []
+
+
 def _build_auto_verify_context():
     """
     高速批次驗證用：一次載入 user_toilets + public_toilets.csv。
@@ -231,29 +270,24 @@ def _build_auto_verify_context():
         except Exception as e:
             logging.warning(f"_build_auto_verify_context user_toilets failed: {e}")
 
-    try:
-        if os.path.exists(TOILETS_FILE_PATH):
-            with open(TOILETS_FILE_PATH, "r", encoding="utf-8-sig", newline="") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    try:
-                        lat = float(row.get("latitude") or row.get("lat") or "")
-                        lon = float(row.get("longitude") or row.get("lon") or "")
-                    except Exception:
-                        continue
-                    items.append({
-                        "source": "public_csv",
-                        "id": row.get("number") or row.get("id") or "",
-                        "name": row.get("name") or "",
-                        "address": row.get("address") or "",
-                        "lat": lat,
-                        "lon": lon,
-                        "verification_status": "approved"
-                    })
-    except Exception as e:
-        logging.warning(f"_build_auto_verify_context public_csv failed: {e}")
+    items.extend(_public_csv_items())
 
-    return {"items": items, "built_at": time.time()}
+    # 格網索引：每筆驗證只看半徑附近的格子，不必把全部 items 掃一遍
+    grid = build_grid_index([it["lat"] for it in items], [it["lon"] for it in items])
+    return {"items": items, "grid": grid, "built_at": time.time()}
+
+
+def _context_candidates(context, lat, lon, radius_m):
+    """
+    回傳可能落在半徑內的 items（依原順序）；呼叫端仍自行做 bbox / 距離判斷。
+    context 沒有格網（外部自組）時退回整份 items。
+    """
+    items = context.get("items") or []
+    grid = context.get("grid")
+    if grid is None:
+        return items
+    rows = grid_candidates(grid, *bbox_bounds(lat, lon, radius_m))
+    return [items[i] for i in sorted(rows)]
 
 
 _CHAIN_BRANDS = {
@@ -401,7 +435,7 @@ def find_similar_toilets(lat, lon, name="", address="", radius_m=50, limit=8, co
     if not (context and isinstance(context, dict) and isinstance(context.get("items"), list)):
         context = _build_auto_verify_context()
 
-    for r in context.get("items") or []:
+    for r in _context_candidates(context, lat, lon, radius_m):
         try:
             # 批次重驗時，避免把自己判成自己的重複資料
             if exclude_id is not None and str(r.get("id")) == str(exclude_id) and (r.get("source") in ("neon", "user_toilets", "user_added")):
@@ -573,6 +607,9 @@ def auto_verify_user_toilet(toilet, context=None, exclude_id=None):
 
     # 4) 重複資料偵測：距離 + 地址優先，名稱弱化
     similar = []
+    if coord_ok and not (context and isinstance(context, dict) and isinstance(context.get("items"), list)):
+        # 重複偵測與空間離群共用同一份 context，不要各自重建一次
+        context = _build_auto_verify_context()
     if coord_ok:
         similar = find_similar_toilets(lat, lon, name=name, address=address, radius_m=80, limit=8, context=context, exclude_id=exclude_id)
 
@@ -1,16 +1,27 @@
 import os
 import csv
 import logging
-import requests
 import heapq
 import math
 import threading
 import time
+import unicodedata
 from urllib.parse import quote
 
-from config import LOC_MAX_RESULTS
-from core.database import POSTGRES_ENABLED, _pg_connect, psycopg2
-from core.utils import _in_bbox, haversine, norm_coord
+try:
+    import pandas as pd
+except Exception:
+    pd = None
+
+from config import LOC_MAX_RESULTS, OVERPASS_CACHE_TTL
+from core.cache import _OVERPASS_CACHE, _GEOCODE_CACHE
+from core.http import http_session_no_retry, nominatim_throttle, response_json
+from core.database import POSTGRES_ENABLED, _pg_connect, psycopg2, get_cached_data, save_cache
+from core.utils import bbox_bounds, grid_coord, haversine, norm_coord
+from core.geo import (
+    np, haversine_np, haversine_many, _M_PER_DEG,
+    build_point_index, query_point_index, build_grid_index, grid_candidates,
+)
 from toilet.floor import _floor_from_tags, _floor_from_name
 from toilet.enrichment import enrich_nearby_places
 
@@ -19,12 +30,94 @@ DATA_DIR = os.path.join(os.getcwd(), "data")
 TOILETS_FILE_PATH = os.path.join(DATA_DIR, "public_toilets.csv")
 
 # public_toilets.csv is in the hot path for every location query.
-# Cache it in memory and reload only when the file mtime changes.
-_PUBLIC_CSV_CACHE = {"mtime": None, "rows": []}
+# Cache it in memory (column-oriented) and reload only when the file mtime changes.
+_PUBLIC_CSV_TEXT_FIELDS = ("number", "name", "address", "grade", "type2")
+_PUBLIC_CSV_CACHE = {"mtime": None, "n": 0}
 _PUBLIC_CSV_CACHE_LOCK = threading.Lock()
+# 檔案執行期間幾乎不會變：mtime 只每隔幾秒檢查一次，平常查詢連 stat 都省掉
+_PUBLIC_CSV_RECHECK_SEC = float(os.getenv("PUBLIC_CSV_RECHECK_SEC", "30"))
+_PUBLIC_CSV_CHECKED_AT = 0.0
+
+# Overpass 結果快取：同一個 ~50m 格點 + 半徑共用一次查詢結果。
+# 空結果可能只是所有 endpoint 都失敗，只短暫快取避免一直重打。
+_OVERPASS_EMPTY_TTL = 120
+_OVERPASS_INFLIGHT = {}
+_OVERPASS_INFLIGHT_LOCK = threading.Lock()
+
+
+def _overpass_cache_get(key):
+    try:
+        hit = _OVERPASS_CACHE.get(key)
+    except Exception:
+        return None
+    if not hit:
+        return None
+    ts, toilets = hit
+    ttl = OVERPASS_CACHE_TTL if toilets else _OVERPASS_EMPTY_TTL
+    if time.time() - ts >= ttl:
+        return None
+    return toilets
+
+
+# 第二層：SQLite request_cache，gunicorn 多個 worker 與重啟之間共用（只存非空結果）
+def _overpass_shared_get(key):
+    try:
+        hit = get_cached_data(f"overpass:{key}", ttl_sec=OVERPASS_CACHE_TTL)
+    except Exception as e:
+        logging.warning("Overpass 共用快取讀取失敗：%s", e)
+        return None
+    if not hit or not hit.get("toilets"):
+        return None
+    # 沿用原本的寫入時間，記憶體層不會把 TTL 延長
+    _OVERPASS_CACHE.set(key, (hit.get("ts", time.time()), hit["toilets"]))
+    return hit["toilets"]
+
+
+def _overpass_shared_put(key, toilets):
+    try:
+        save_cache(f"overpass:{key}", {"ts": time.time(), "toilets": toilets})
+    except Exception as e:
+        logging.warning("Overpass 共用快取寫入失敗：%s", e)
 
 
 def query_overpass_toilets(lat, lon, radius=500):
+    """Overpass 查詢（含 TTL 快取；同 key 的並行請求只會打一次 Overpass）。"""
+    key = f"{grid_coord(lat)},{grid_coord(lon)}:{radius}"
+
+    toilets = _overpass_cache_get(key)
+    if toilets is None:
+        with _OVERPASS_INFLIGHT_LOCK:
+            key_lock = _OVERPASS_INFLIGHT.setdefault(key, threading.Lock())
+        with key_lock:
+            # 等鎖期間可能已由其他執行緒查完
+            toilets = _overpass_cache_get(key)
+            if toilets is None:
+                try:
+                    toilets = _overpass_shared_get(key)
+                    if toilets is None:
+                        toilets = _query_overpass_toilets_uncached(lat, lon, radius)
+                        _OVERPASS_CACHE.set(key, (time.time(), toilets))
+                        if toilets:
+                            _overpass_shared_put(key, toilets)
+                finally:
+                    with _OVERPASS_INFLIGHT_LOCK:
+                        _OVERPASS_INFLIGHT.pop(key, None)
+
+    # 呼叫端會在 dict 上加排序分數等欄位，回傳複本避免污染快取
+    return [dict(t) for t in toilets]
+
+
+# 查詢字串樣板：模組載入時組好一次，每次只填入數值；不含縮排換行，送出的 body 也較小。
+# 廁所幾乎都是 node，少數是建物 way；relation 幾乎沒有，省掉以減少伺服器運算。
+_OVERPASS_TOILETS_QUERY = (
+    '[out:json][timeout:%d];'
+    '(node["amenity"="toilets"](around:%s,%s,%s);'
+    'way["amenity"="toilets"](around:%s,%s,%s););'
+    'out center tags qt %d;'
+)
+
+
+def _query_overpass_toilets_uncached(lat, lon, radius=500):
     overall_deadline = time.time() + 8.0
 
     def _left():
@@ -48,27 +141,26 @@ def query_overpass_toilets(lat, lon, radius=500):
     except Exception:
         enrich_on = False
 
+    # 最多處理 4 * max_items（避免 elements 太多）；同一上限也交給 Overpass 在伺服器端截斷
+    hard_cap = max(40, max_items * 4)
+
     # 先小半徑再原半徑
     for r in (300, radius):
         if time.time() >= overall_deadline:
             break
 
-        query = f"""
-        [out:json][timeout:25];
-        (
-          node["amenity"="toilets"](around:{r},{lat},{lon});
-          way["amenity"="toilets"](around:{r},{lat},{lon});
-          relation["amenity"="toilets"](around:{r},{lat},{lon});
-        );
-        out center tags;
-        """
+        # 伺服器端 timeout 跟著剩餘期限走：客戶端放棄後 Overpass 不必繼續算、也不會再佔我們的查詢額度。
+        server_timeout = max(2, int(_left()))
+        query = (_OVERPASS_TOILETS_QUERY % (
+            server_timeout, r, lat, lon, r, lat, lon, hard_cap
+        )).encode("ascii")
 
         last_err = None
         for idx, url in enumerate(endpoints):
             if time.time() >= overall_deadline:
                 break
             try:
-                resp = requests.post(
+                resp = http_session_no_retry.post(
                     url,
                     data=query,
                     headers=headers,
@@ -79,13 +171,13 @@ def query_overpass_toilets(lat, lon, radius=500):
                     last_err = RuntimeError(f"overpass non-json {resp.status_code}")
                     continue
 
-                data = resp.json()
+                data = response_json(resp)
                 elements = data.get("elements", [])
 
                 toilets = []
+                candidates = []
+                min_lat, max_lat, min_lon, max_lon = bbox_bounds(lat, lon, r)
 
-                # 最多處理 4 * max_items（避免 elements 太多）
-                hard_cap = max(40, max_items * 4)
                 processed = 0
 
                 for elem in elements:
@@ -105,9 +197,35 @@ def query_overpass_toilets(lat, lon, radius=500):
                     if t_lat is None or t_lon is None:
                         continue
 
-                    if not _in_bbox(t_lat, t_lon, lat, lon, r):
+                    try:
+                        t_lat = float(t_lat)
+                        t_lon = float(t_lon)
+                    except Exception:
+                        continue
+
+                    if not (min_lat <= t_lat <= max_lat and min_lon <= t_lon <= max_lon):
                         continue
 
+                    candidates.append((elem, t_lat, t_lon))
+
+                # 距離一次批次算完，不在迴圈內逐筆呼叫 haversine
+                dists = haversine_many(
+                    float(lat), float(lon),
+                    [c[1] for c in candidates],
+                    [c[2] for c in candidates],
+                )
+
+                # 先在 (距離, 原順序) 上取最近的 max_items 筆（O(N log K)；平手時與原本穩定排序一致），
+                # 只替真的會回傳的幾筆解析 tags / 樓層、建 dict
+                nearest = heapq.nsmallest(
+                    max_items,
+                    ((dist, i) for i, dist in enumerate(dists) if dist <= r)
+                )
+                if not nearest:
+                    continue
+
+                for dist, i in nearest:
+                    elem, t_lat, t_lon = candidates[i]
                     tags = elem.get("tags", {}) or {}
                     name = tags.get("name", "無名稱")
                     address = (
@@ -118,17 +236,6 @@ def query_overpass_toilets(lat, lon, radius=500):
 
                     floor_hint = _floor_from_tags(tags) or _floor_from_name(name)
 
-                    try:
-                        dist = haversine(
-                            float(lat), float(lon),
-                            float(t_lat), float(t_lon)
-                        )
-                    except Exception:
-                        continue
-
-                    if dist > r:
-                        continue
-
                     toilets.append({
                         "name": name,
                         "lat": float(norm_coord(t_lat)),
@@ -142,9 +249,6 @@ def query_overpass_toilets(lat, lon, radius=500):
                         "entrance_hint": tags.get("entrance") or "",
                     })
 
-                if not toilets:
-                    continue
-
                 # enrich（保持你原本邏輯，不動）
                 if enrich_on:
                     try:
@@ -154,7 +258,14 @@ def query_overpass_toilets(lat, lon, radius=500):
                                 if (not t.get("name")) or t["name"] == "無名稱":
                                     best = None
                                     best_d = 61.0
+                                    t_lat, t_lon = t["lat"], t["lon"]
+                                    kx = _M_PER_DEG * math.cos(math.radians(t_lat))
                                     for p in nearby_named:
+                                        # 平面近似先擋掉明顯比目前最佳更遠的點（幾十公尺內誤差遠小於 1%，留 1% 餘裕）
+                                        dy = (p["lat"] - t_lat) * _M_PER_DEG
+                                        dx = (p["lon"] - t_lon) * kx
+                                        if dx * dx + dy * dy > (best_d * 1.01) ** 2:
+                                            continue
                                         d = haversine(
                                             t["lat"], t["lon"],
                                             p["lat"], p["lon"]
@@ -167,18 +278,13 @@ def query_overpass_toilets(lat, lon, radius=500):
                     except Exception:
                         pass
 
-                toilets = heapq.nsmallest(
-                    max_items,
-                    toilets,
-                    key=lambda x: x["distance"]
-                )
                 return toilets
 
             except Exception as e:
                 last_err = e
-                logging.warning(f"Overpass API 查詢失敗（endpoint {idx}）: {e}")
+                logging.warning("Overpass API 查詢失敗（endpoint %s）: %s", idx, e)
 
-        logging.warning(f"Overpass 半徑 {r} 失敗：{last_err}")
+        logging.warning("Overpass 半徑 %s 失敗：%s", r, last_err)
 
     return []
 
@@ -210,16 +316,26 @@ def query_saved_toilets(user_lat, user_lon, radius=500):
         rows = cur.fetchall()
         conn.close()
 
+        candidates = []
         for row in rows:
             try:
                 t_lat = float(row.get("lat"))
                 t_lon = float(row.get("lon"))
             except Exception:
                 continue
-            if not _in_bbox(t_lat, t_lon, user_lat, user_lon, radius):
+            # SQL 已用同樣的矩形篩過，這裡只擋邊界/型別誤差
+            if not (min_lat <= t_lat <= max_lat and min_lon <= t_lon <= max_lon):
                 continue
-            dist = haversine(user_lat, user_lon, t_lat, t_lon)
-            if dist > radius:
+            candidates.append((row, t_lat, t_lon))
+
+        dists = haversine_many(
+            user_lat, user_lon,
+            [c[1] for c in candidates],
+            [c[2] for c in candidates],
+        )
+
+        for (row, t_lat, t_lon), dist in zip(candidates, dists):
+            if not dist <= radius:
                 continue
             item = {
                 "name": (row.get("name") or "無名稱").strip(),
@@ -244,75 +360,279 @@ def query_saved_toilets(user_lat, user_lon, radius=500):
 
     return [item for _, _, item in sorted(heap, key=lambda x: -x[0])]
 
-def _load_public_csv_rows_cached():
-    """Load public_toilets.csv once and refresh only when the file changes."""
+def _empty_public_csv_cache(mtime=None):
+    cache = {"mtime": mtime, "n": 0, "lat": [], "lon": []}
+    for f in _PUBLIC_CSV_TEXT_FIELDS:
+        cache[f] = []
+    return cache
+
+
+def _read_public_csv_pandas(mtime):
+    """C-engine one-shot parse; only the columns the query path needs."""
+    wanted = set(_PUBLIC_CSV_TEXT_FIELDS) | {"latitude", "longitude"}
+    read_kw = dict(
+        engine="c",
+        encoding="utf-8-sig",
+        usecols=lambda c: c in wanted,
+        keep_default_na=False,
+        on_bad_lines="skip",
+    )
+    try:
+        # 座標直接由 C parser 轉成 float64；整份檔案座標都乾淨時最快
+        dtypes = {f: str for f in _PUBLIC_CSV_TEXT_FIELDS}
+        dtypes.update(latitude="float64", longitude="float64")
+        df = pd.read_csv(TOILETS_FILE_PATH, dtype=dtypes, **read_kw)
+        lat = df["latitude"].to_numpy(dtype=np.float64)
+        lon = df["longitude"].to_numpy(dtype=np.float64)
+    except ValueError:
+        # 有空白/非數字座標：全部當字串讀，再逐欄 coerce 成 NaN
+        df = pd.read_csv(TOILETS_FILE_PATH, dtype=str, **read_kw)
+        lat = pd.to_numeric(df["latitude"], errors="coerce").to_numpy(dtype=np.float64)
+        lon = pd.to_numeric(df["longitude"], errors="coerce").to_numpy(dtype=np.float64)
+    n = len(df)
+    cache = {"mtime": mtime, "n": n}
+    for f in _PUBLIC_CSV_TEXT_FIELDS:
+        cache[f] = df[f].to_numpy(dtype=object) if f in df.columns else np.full(n, "", dtype=object)
+    cache["lat"] = lat
+    cache["lon"] = lon
+    cache["bad"] = int(np.count_nonzero(~(np.isfinite(cache["lat"]) & np.isfinite(cache["lon"]))))
+    return cache
+
+
+def _read_public_csv_stdlib(mtime):
+    """沒有 pandas 時的備援：csv.reader 逐列串流，依表頭欄位位置取值（不為每列建 dict）。"""
+    cache = _empty_public_csv_cache(mtime)
+    bad = 0
+    nan = float("nan")
+    lats = cache["lat"]
+    lons = cache["lon"]
+    with open(TOILETS_FILE_PATH, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        # 與 DictReader 相同：欄名重複時以最後一欄為準
+        col = {name: i for i, name in enumerate(header)}
+        lat_i = col.get("latitude")
+        lon_i = col.get("longitude")
+        text_cols = [(cache[fld], col.get(fld)) for fld in _PUBLIC_CSV_TEXT_FIELDS]
+        for row in reader:
+            if not row:
+                continue
+            try:
+                t_lat = float(row[lat_i])
+                t_lon = float(row[lon_i])
+            except (TypeError, ValueError, IndexError):
+                # 壞列只計數，載入完成後彙總記一行 log
+                t_lat = t_lon = nan
+                bad += 1
+            lats.append(t_lat)
+            lons.append(t_lon)
+            width = len(row)
+            for out, i in text_cols:
+                out.append(row[i] if i is not None and i < width else "")
+    cache["n"] = len(cache["lat"])
+    cache["bad"] = bad
+    if np is not None:
+        cache["lat"] = np.asarray(cache["lat"], dtype=np.float64)
+        cache["lon"] = np.asarray(cache["lon"], dtype=np.float64)
+    return cache
+
+
+def _build_public_csv_index(cache):
+    if np is None or not cache.get("n"):
+        return None
+    try:
+        return build_point_index(cache["lat"], cache["lon"])
+    except Exception as e:
+        logging.warning("public_toilets.csv 空間索引建立失敗，改用全表掃描：%s", e)
+        return None
+
+
+def _build_public_csv_grid(cache):
+    if not cache.get("n"):
+        return None
+    try:
+        return build_grid_index(cache["lat"], cache["lon"])
+    except Exception as e:
+        logging.warning("public_toilets.csv 格網索引建立失敗，改用全表掃描：%s", e)
+        return None
+
+
+def _load_public_csv_cached():
+    """Load public_toilets.csv once and refresh only when the file changes.
+
+    The cache is column-oriented: number/name/address/grade/type2 plus lat/lon,
+    all indexed by the same row position (lat/lon are float arrays with numpy).
+    """
+    global _PUBLIC_CSV_CACHE, _PUBLIC_CSV_CHECKED_AT
+    snapshot = _PUBLIC_CSV_CACHE
+    now = time.time()
+    if snapshot.get("mtime") is not None and now - _PUBLIC_CSV_CHECKED_AT < _PUBLIC_CSV_RECHECK_SEC:
+        return snapshot
+
     if not os.path.exists(TOILETS_FILE_PATH):
-        return []
+        return _empty_public_csv_cache()
 
     try:
         mtime = os.path.getmtime(TOILETS_FILE_PATH)
     except Exception as e:
         logging.error(f"讀 public_toilets.csv mtime 失敗：{e}")
-        return []
+        return _empty_public_csv_cache()
 
-    cached_rows = _PUBLIC_CSV_CACHE.get("rows") or []
-    if _PUBLIC_CSV_CACHE.get("mtime") == mtime:
-        return cached_rows
+    if snapshot.get("mtime") == mtime:
+        _PUBLIC_CSV_CHECKED_AT = now
+        return snapshot
 
     with _PUBLIC_CSV_CACHE_LOCK:
-        cached_rows = _PUBLIC_CSV_CACHE.get("rows") or []
-        if _PUBLIC_CSV_CACHE.get("mtime") == mtime:
-            return cached_rows
+        snapshot = _PUBLIC_CSV_CACHE
+        if snapshot.get("mtime") == mtime:
+            return snapshot
 
         try:
-            with open(TOILETS_FILE_PATH, "r", encoding="utf-8-sig", newline="") as f:
-                rows = list(csv.DictReader(f))
-            _PUBLIC_CSV_CACHE["mtime"] = mtime
-            _PUBLIC_CSV_CACHE["rows"] = rows
-            logging.info(f"✅ public_toilets.csv cached: {len(rows)} rows")
-            return rows
+            if pd is not None and np is not None:
+                try:
+                    cache = _read_public_csv_pandas(mtime)
+                except Exception as e:
+                    logging.warning("pandas 讀 public_toilets.csv 失敗，改用 csv 模組：%s", e)
+                    cache = _read_public_csv_stdlib(mtime)
+            else:
+                cache = _read_public_csv_stdlib(mtime)
+            cache["index"] = _build_public_csv_index(cache)
+            # 沒有 BallTree（未裝 scikit-learn）時改用格網索引，避免每次全表掃描
+            cache["grid"] = _build_public_csv_grid(cache) if cache["index"] is None else None
+            # 整包替換，讓查詢端拿到的各欄位永遠是同一版
+            _PUBLIC_CSV_CACHE = cache
+            _PUBLIC_CSV_CHECKED_AT = now
+            logging.info("✅ public_toilets.csv cached: %d rows (%d without valid coordinates)",
+                         cache["n"], cache.get("bad", 0))
+            return cache
         except Exception as e:
             logging.error(f"讀 public_toilets.csv 失敗：{e}")
-            return cached_rows
+            return snapshot
+
+
+_PUBLIC_CSV_WARMUP_STARTED = False
+
+
+def start_public_csv_warmup_background():
+    """
+    開機後在背景先載入 public_toilets.csv（含空間索引），
+    避免第一位查附近廁所的使用者等整份 CSV 解析。每個 process 只排一次。
+    """
+    global _PUBLIC_CSV_WARMUP_STARTED
+    with _PUBLIC_CSV_CACHE_LOCK:
+        if _PUBLIC_CSV_WARMUP_STARTED:
+            return
+        _PUBLIC_CSV_WARMUP_STARTED = True
+
+    def _job():
+        try:
+            _load_public_csv_cached()
+        except Exception as e:
+            logging.error("❌ public_toilets.csv warmup failed: %s", e, exc_info=True)
+
+    try:
+        threading.Thread(target=_job, name="public-csv-warmup", daemon=True).start()
+    except Exception as e:
+        logging.error("❌ failed to start public_toilets.csv warmup thread: %s", e, exc_info=True)
+
+
+def invalidate_public_csv_cache():
+    """
+    更新 public_toilets.csv 後呼叫（例如匯入新的政府資料）：下一次查詢會重新載入。
+    舊資料先保留，重新載入失敗時仍可繼續服務。
+    """
+    global _PUBLIC_CSV_CACHE, _PUBLIC_CSV_CHECKED_AT
+    with _PUBLIC_CSV_CACHE_LOCK:
+        _PUBLIC_CSV_CACHE = dict(_PUBLIC_CSV_CACHE, mtime=None)
+        _PUBLIC_CSV_CHECKED_AT = 0.0
+
+
+def _public_csv_item(cache, i, t_lat, t_lon, dist):
+    name = (cache["name"][i] or "無名稱").strip()
+    addr = (cache["address"][i] or "").strip()
+    return {
+        "name": name,
+        "lat": float(norm_coord(t_lat)),
+        "lon": float(norm_coord(t_lon)),
+        "address": addr,
+        "distance": dist,
+        "type": "public_csv",
+        "grade": cache["grade"][i],
+        "category": cache["type2"][i],
+        "floor_hint": _floor_from_name(name),
+    }
+
+
+def _query_public_csv_vectorized(cache, user_lat, user_lon, radius):
+    lats = cache["lat"]
+    lons = cache["lon"]
+
+    if cache.get("index") is not None:
+        idx, dist = query_point_index(cache["index"], user_lat, user_lon, radius)
+        return [
+            _public_csv_item(cache, i, float(lats[i]), float(lons[i]), float(d))
+            for i, d in zip(idx[:LOC_MAX_RESULTS].tolist(), dist[:LOC_MAX_RESULTS].tolist())
+        ]
+
+    if cache.get("grid") is not None:
+        # 格網索引只取涵蓋查詢矩形的幾格，再對這些候選算精確距離
+        idx = grid_candidates(cache["grid"], *bbox_bounds(user_lat, user_lon, radius))
+        if len(idx) == 0:
+            return []
+        dist = haversine_np(user_lat, user_lon, lats[idx], lons[idx])
+    else:
+        # 格網建立失敗時的最後備援：整表算一次向量化距離
+        idx = np.arange(lats.shape[0])
+        dist = haversine_np(user_lat, user_lon, lats, lons)
+    keep = np.flatnonzero(dist <= radius)
+    if keep.size == 0:
+        return []
+    if keep.size > LOC_MAX_RESULTS:
+        # 只需要最近 K 筆：argpartition O(N) 選出後再排序這 K 筆
+        keep = keep[np.argpartition(dist[keep], LOC_MAX_RESULTS - 1)[:LOC_MAX_RESULTS]]
+    keep = keep[np.argsort(dist[keep], kind="stable")]
+
+    return [
+        _public_csv_item(cache, i, float(lats[i]), float(lons[i]), float(d))
+        for i, d in zip(idx[keep].tolist(), dist[keep].tolist())
+    ]
+
 
 def query_public_csv_toilets(user_lat, user_lon, radius=500):
-    rows = _load_public_csv_rows_cached()
-    if not rows:
+    cache = _load_public_csv_cached()
+    if not cache.get("n"):
         return []
 
+    if np is not None:
+        try:
+            return _query_public_csv_vectorized(cache, float(user_lat), float(user_lon), radius)
+        except Exception as e:
+            logging.warning("public_toilets.csv 向量化查詢失敗，改用逐筆掃描：%s", e)
+
     heap = []
     limit = LOC_MAX_RESULTS
 
     try:
-        for row in rows:
-            try:
-                t_lat = float(row.get("latitude"))
-                t_lon = float(row.get("longitude"))
-            except Exception:
-                continue
-
-            if not _in_bbox(t_lat, t_lon, user_lat, user_lon, radius):
+        lats = cache["lat"]
+        lons = cache["lon"]
+        # 矩形範圍只算一次；NaN 座標的比較一律為 False，自然被排除
+        min_lat, max_lat, min_lon, max_lon = bbox_bounds(user_lat, user_lon, radius)
+        if cache.get("grid") is not None:
+            rows = grid_candidates(cache["grid"], min_lat, max_lat, min_lon, max_lon)
+        else:
+            rows = range(cache["n"])
+        for i in rows:
+            t_lat = float(lats[i])
+            t_lon = float(lons[i])
+
+            if not (min_lat <= t_lat <= max_lat and min_lon <= t_lon <= max_lon):
                 continue
 
             dist = haversine(user_lat, user_lon, t_lat, t_lon)
             if dist > radius:
                 continue
 
-            name = (row.get("name") or "無名稱").strip()
-            addr = (row.get("address") or "").strip()
-            floor_hint = _floor_from_name(name)
-
-            item = {
-                "name": name,
-                "lat": float(norm_coord(t_lat)),
-                "lon": float(norm_coord(t_lon)),
-                "address": addr,
-                "distance": dist,
-                "type": "public_csv",
-                "grade": row.get("grade", ""),
-                "category": row.get("type2", ""),
-                "floor_hint": floor_hint,
-            }
+            item = _public_csv_item(cache, i, t_lat, t_lon, dist)
 
             heapq.heappush(heap, (-dist, id(item), item))
             if len(heap) > limit:
@@ -324,7 +644,63 @@ def query_public_csv_toilets(user_lat, user_lon, radius=500):
 
     return [item for _, _, item in sorted(heap, key=lambda x: -x[0])]
 
+# === 地址轉經緯度（Nominatim）===
+# 結果先放行程內 LRU，再存進 SQLite request_cache（跨 worker / 重啟）：
+# 同一地址在新增廁所流程中會被查好幾次（表單 + 自動驗證）。
+# Nominatim 使用規範是每秒最多 1 次：遠端查詢一律先過 core.http.nominatim_throttle()。
+GEOCODE_CACHE_TTL = int(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 3600)))
+GEOCODE_MISS_TTL = int(os.getenv("GEOCODE_MISS_TTL", str(24 * 3600)))
+
+
+def _geocode_fresh(hit):
+    age = time.time() - hit.get("ts", 0)
+    return age < (GEOCODE_CACHE_TTL if hit.get("found") else GEOCODE_MISS_TTL)
+
+
+def _geocode_key(address):
+    """
+    快取 key 用的地址正規化：全形/半形（NFKC）、「臺/台」、空白、大小寫差異都視為同一地址。
+    標點（例如 1-2 號的連字號）會影響門牌，不去掉。
+    """
+    s = unicodedata.normalize("NFKC", address).replace("臺", "台")
+    return "geocode:" + "".join(s.split()).lower()
+
+
 def geocode_address(address):
+    # 空白差異、大小寫不同視為同一地址；全形字先轉半形再送 Nominatim
+    address = " ".join(unicodedata.normalize("NFKC", address or "").split())
+    key = _geocode_key(address)
+
+    try:
+        hit = _GEOCODE_CACHE.get(key)
+    except Exception:
+        hit = None
+    if hit is not None and _geocode_fresh(hit):
+        return hit.get("lat"), hit.get("lon")
+
+    try:
+        hit = get_cached_data(key, ttl_sec=GEOCODE_CACHE_TTL)
+        if hit is not None and _geocode_fresh(hit):
+            _GEOCODE_CACHE.set(key, hit)
+            return hit.get("lat"), hit.get("lon")
+    except Exception as e:
+        logging.warning("geocode 快取讀取失敗：%s", e)
+
+    lat, lon, found = _geocode_address_remote(address)
+
+    # 只快取確定的結果；HTTP/網路錯誤（found=None）下次再試
+    if found is not None:
+        hit = {"lat": lat, "lon": lon, "found": found, "ts": time.time()}
+        try:
+            _GEOCODE_CACHE.set(key, hit)
+            save_cache(key, hit)
+        except Exception as e:
+            logging.warning("geocode 快取寫入失敗：%s", e)
+    return lat, lon
+
+
+def _geocode_address_remote(address):
+    """打 Nominatim；回傳 (lat, lon, found)。found=False 代表「確定查無結果」，可負向快取。"""
     try:
         ua_email = os.getenv("CONTACT_EMAIL", "school-toilet-bot@gmail.com")
 
@@ -337,40 +713,41 @@ def geocode_address(address):
             "User-Agent": f"ToiletBot/1.0 (+{ua_email})"
         }
 
-        resp = requests.get(url, headers=headers, timeout=10)
+        nominatim_throttle()
+        resp = http_session_no_retry.get(url, headers=headers, timeout=10)
 
         # ① HTTP 狀態碼檢查
         if resp.status_code != 200:
             logging.error(
                 f"地址轉經緯度失敗: HTTP {resp.status_code}, text={resp.text[:200]}"
             )
-            return None, None
+            return None, None, None
 
         # ② 空回應檢查
         if not resp.text or not resp.text.strip():
             logging.error("地址轉經緯度失敗: 回傳內容為空")
-            return None, None
+            return None, None, None
 
         # ③ JSON 解析保護
         try:
-            data = resp.json()
+            data = response_json(resp)
         except Exception:
             logging.error(
                 f"地址轉經緯度失敗: 非 JSON 回應, text={resp.text[:200]}"
             )
-            return None, None
+            return None, None, None
 
         # ④ 資料內容檢查
         if not data:
             logging.warning(f"地址轉經緯度失敗: 查無結果 address={address}")
-            return None, None
+            return None, None, False
 
         # ⑤ 正常回傳
         lat = float(data[0].get("lat"))
         lon = float(data[0].get("lon"))
-        return lat, lon
+        return lat, lon, True
 
     except Exception as e:
         logging.error(f"地址轉經緯度例外錯誤: {e}", exc_info=True)
 
-    return None, None
+    return None, None, None
@@ -1,9 +1,9 @@
 import os
 import time
-import requests
 
 from config import ENRICH_MAX_ITEMS
 from core.cache import _ENRICH_CACHE
+from core.http import http_session_no_retry, response_json
 from core.utils import haversine
 
 # === 依附近場館命名 ===
@@ -47,9 +47,9 @@ def enrich_nearby_places(lat, lon, radius=500):
 
     for url in endpoints:
         try:
-            resp = requests.post(url, data=q, headers=headers, timeout=30)
+            resp = http_session_no_retry.post(url, data=q, headers=headers, timeout=30)
             if resp.status_code == 200 and "json" in (resp.headers.get("Content-Type","").lower()):
-                els = resp.json().get("elements", [])
+                els = response_json(resp).get("elements", [])
                 out = []
                 for e in els:
                     if e.get("type") == "node":
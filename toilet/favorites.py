@@ -2,7 +2,10 @@ import os
 import csv
 import logging
 import threading
+import time
 
+from core.cache import SimpleLRU
+from core.database import _get_db, bump_shared_cache_version, shared_cache_version
 from core.utils import norm_coord
 
 POSTGRES_ENABLED = False
@@ -21,14 +24,92 @@ def configure_favorites(postgres_enabled=False, pg_connect=None, favorites_file_
         psycopg2 = psycopg2_module
 
 # === 最愛管理 ===
-# favorites.txt 是純文字/CSV 檔，於多執行緒環境下需要鎖避免同時讀寫造成破檔
-# （例如同一時間多位使用者點收藏/取消收藏）
+# 非 Postgres 模式的本機備援改存 SQLite（cache.db 的 favorites 表，依 user_id 建索引），
+# 不再每次整檔掃描/重寫 favorites.txt。舊檔內容會在第一次使用時匯入一次。
 _FAV_LOCK = threading.Lock()
+_FAV_LEGACY_IMPORTED = False
+
+# uid -> (ts, version, favs)：查看最愛不必每次連 Neon。
+# 新增/移除會把 cache.db 裡這個 uid 的版本號 +1，所有 gunicorn worker 命中前都會比對版本，
+# 使用者剛改完、下一個請求落到別的 worker 也不會看到舊清單。
+FAV_CACHE_TTL = int(os.getenv("FAV_CACHE_TTL", "30"))
+_FAV_LIST_LIMIT = 50
+_FAV_CACHE = SimpleLRU(maxsize=int(os.getenv("FAV_CACHE_SIZE", "2000")))
+_FAV_CACHE_LOCK = threading.Lock()
+
+
+def _fav_version_key(uid):
+    return f"fav:{uid}"
+
+
+def _fav_cache_get(uid, version):
+    if version is None:
+        return None
+    with _FAV_CACHE_LOCK:
+        hit = _FAV_CACHE.get(uid)
+    if hit and hit[1] == version and time.time() - hit[0] < FAV_CACHE_TTL:
+        return [dict(f) for f in hit[2]]
+    return None
+
+
+def _fav_cache_put(uid, version, favs):
+    if version is None:
+        return
+    with _FAV_CACHE_LOCK:
+        _FAV_CACHE.set(uid, (time.time(), version, [dict(f) for f in favs]))
+
+
+def _fav_cache_invalidate(uid):
+    with _FAV_CACHE_LOCK:
+        _FAV_CACHE.pop(uid, None)
+    bump_shared_cache_version(_fav_version_key(uid))
+
+
+def _fav_cache_discard(uid, name, lat, lon):
+    """移除成功後直接從快取清單拿掉那一筆（保留原本的 TTL），下一次查看最愛不必重讀 DB。
+    只有快取正好是這次 +1 的前一版（期間沒有別的 worker 改過）、清單沒被 LIMIT 截斷、
+    而且找得到那一筆時才就地修補並記成新版本；其他情況退回整筆失效。"""
+    version = bump_shared_cache_version(_fav_version_key(uid))
+    key = (name, norm_coord(lat), norm_coord(lon))
+    with _FAV_CACHE_LOCK:
+        hit = _FAV_CACHE.pop(uid, None)
+        if (
+            hit
+            and version is not None
+            and hit[1] == version - 1
+            and len(hit[2]) < _FAV_LIST_LIMIT
+            and time.time() - hit[0] < FAV_CACHE_TTL
+        ):
+            kept = [f for f in hit[2] if (f.get("name"), norm_coord(f.get("lat")), norm_coord(f.get("lon"))) != key]
+            if len(kept) < len(hit[2]):
+                _FAV_CACHE.set(uid, (hit[0], version, kept))
+
+
+def _import_legacy_favorites_file(conn):
+    """把舊的 favorites.txt 匯入 SQLite（每個 process 只檢查一次），匯入後改名避免重複匯入。"""
+    global _FAV_LEGACY_IMPORTED
+    if _FAV_LEGACY_IMPORTED:
+        return
+    with _FAV_LOCK:
+        if _FAV_LEGACY_IMPORTED:
+            return
+        if os.path.exists(FAVORITES_FILE_PATH) and os.path.getsize(FAVORITES_FILE_PATH) > 0:
+            with open(FAVORITES_FILE_PATH, "r", encoding="utf-8", newline="") as f:
+                rows = [row[:5] for row in csv.reader(f) if len(row) >= 5]
+            if rows:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO favorites (user_id, name, lat, lon, address) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                conn.commit()
+            os.replace(FAVORITES_FILE_PATH, FAVORITES_FILE_PATH + ".imported")
+            logging.info("favorites.txt 已匯入 SQLite：%d 筆", len(rows))
+        _FAV_LEGACY_IMPORTED = True
 
 def add_to_favorites(uid, toilet):
     """Add a toilet to favorites.
     Primary store: Neon/Postgres favorites table.
-    Fallback: local favorites.txt, only if Postgres is not enabled.
+    Fallback: local SQLite favorites table, only if Postgres is not enabled.
     """
     try:
         if not uid or not toilet:
@@ -56,24 +137,23 @@ def add_to_favorites(uid, toilet):
             """, (uid, name, lat_f, lon_f, address))
             conn.commit()
             conn.close()
+            _fav_cache_invalidate(uid)
             return True
 
-        lat_s = norm_coord(lat_f)
-        lon_s = norm_coord(lon_f)
-        with _FAV_LOCK:
-            # avoid duplicate rows in fallback file
-            exists = False
-            if os.path.exists(FAVORITES_FILE_PATH):
-                with open(FAVORITES_FILE_PATH, "r", encoding="utf-8", newline="") as f:
-                    reader = csv.reader(f)
-                    for row in reader:
-                        if len(row) >= 4 and row[0] == uid and row[1] == name and row[2] == lat_s and row[3] == lon_s:
-                            exists = True
-                            break
-            if not exists:
-                with open(FAVORITES_FILE_PATH, "a", encoding="utf-8", newline="") as f:
-                    writer = csv.writer(f)
-                    writer.writerow([uid, name, lat_s, lon_s, address])
+        conn = _get_db()
+        try:
+            _import_legacy_favorites_file(conn)
+            # UNIQUE(user_id, name, lat, lon) 擋重複；已存在時只補上地址
+            conn.execute("""
+                INSERT INTO favorites (user_id, name, lat, lon, address)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (user_id, name, lat, lon)
+                DO UPDATE SET address = COALESCE(NULLIF(excluded.address, ''), favorites.address)
+            """, (uid, name, norm_coord(lat_f), norm_coord(lon_f), address))
+            conn.commit()
+        finally:
+            conn.close()
+        _fav_cache_invalidate(uid)
         return True
 
     except Exception as e:
@@ -82,7 +162,7 @@ def add_to_favorites(uid, toilet):
 
 
 def remove_from_favorites(uid, name, lat, lon):
-    """Remove a favorite from Neon/Postgres, with local-file fallback."""
+    """Remove a favorite from Neon/Postgres, with local SQLite fallback."""
     try:
         if not uid or not name:
             return False
@@ -104,28 +184,23 @@ def remove_from_favorites(uid, name, lat, lon):
             row = cur.fetchone()
             conn.commit()
             conn.close()
+            if row:
+                _fav_cache_discard(uid, name, lat_f, lon_f)
             return bool(row)
 
-        lat_s = norm_coord(lat_f)
-        lon_s = norm_coord(lon_f)
-        with _FAV_LOCK:
-            rows = []
-            changed = False
-            if os.path.exists(FAVORITES_FILE_PATH):
-                with open(FAVORITES_FILE_PATH, "r", encoding="utf-8", newline="") as f:
-                    reader = csv.reader(f)
-                    for row in reader:
-                        if len(row) < 5:
-                            rows.append(row)
-                            continue
-                        if not (row[0] == uid and row[1] == name and row[2] == lat_s and row[3] == lon_s):
-                            rows.append(row)
-                        else:
-                            changed = True
-            if changed:
-                with open(FAVORITES_FILE_PATH, "w", encoding="utf-8", newline="") as f:
-                    writer = csv.writer(f)
-                    writer.writerows(rows)
+        conn = _get_db()
+        try:
+            _import_legacy_favorites_file(conn)
+            cur = conn.execute(
+                "DELETE FROM favorites WHERE user_id = ? AND name = ? AND lat = ? AND lon = ?",
+                (uid, name, norm_coord(lat_f), norm_coord(lon_f)),
+            )
+            changed = cur.rowcount > 0
+            conn.commit()
+        finally:
+            conn.close()
+        if changed:
+            _fav_cache_discard(uid, name, lat_f, lon_f)
         return changed
 
     except Exception as e:
@@ -141,6 +216,12 @@ def get_user_favorites(uid):
     if not uid:
         return favs
 
+    # 版本號要在讀 DB 之前取得：讀取期間若有異動，存進快取的舊版本下次就對不上
+    version = shared_cache_version(_fav_version_key(uid))
+    cached = _fav_cache_get(uid, version)
+    if cached is not None:
+        return cached
+
     try:
         if POSTGRES_ENABLED:
             conn = _pg_connect()
@@ -150,8 +231,8 @@ def get_user_favorites(uid):
                 FROM favorites
                 WHERE user_id = %s
                 ORDER BY created_at DESC
-                LIMIT 50
-            """, (uid,))
+                LIMIT %s
+            """, (uid, _FAV_LIST_LIMIT))
             rows = cur.fetchall()
             conn.close()
 
@@ -165,27 +246,33 @@ def get_user_favorites(uid):
                     "type": "favorite",
                     "source": "最愛",
                 })
+            _fav_cache_put(uid, version, favs)
             return favs
 
-        with _FAV_LOCK:
-            if not os.path.exists(FAVORITES_FILE_PATH):
-                return favs
-            with open(FAVORITES_FILE_PATH, "r", encoding="utf-8", newline="") as f:
-                reader = csv.reader(f)
-                for row in reader:
-                    if len(row) < 5:
-                        continue
-                    if row[0] != uid:
-                        continue
-                    favs.append({
-                        "user_id": row[0],
-                        "name": row[1],
-                        "lat": float(row[2]),
-                        "lon": float(row[3]),
-                        "address": row[4],
-                        "type": "favorite",
-                        "source": "最愛",
-                    })
+        conn = _get_db()
+        try:
+            _import_legacy_favorites_file(conn)
+            rows = conn.execute("""
+                SELECT user_id, name, lat, lon, address
+                FROM favorites
+                WHERE user_id = ?
+                ORDER BY id DESC
+                LIMIT ?
+            """, (uid, _FAV_LIST_LIMIT)).fetchall()
+        finally:
+            conn.close()
+
+        for r in rows:
+            favs.append({
+                "user_id": r["user_id"],
+                "name": r["name"],
+                "lat": float(r["lat"]),
+                "lon": float(r["lon"]),
+                "address": r["address"] or "",
+                "type": "favorite",
+                "source": "最愛",
+            })
+        _fav_cache_put(uid, version, favs)
         return favs
 
     except Exception as e:
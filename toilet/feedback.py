@@ -1,4 +1,10 @@
+import os
 import logging
+import threading
+import time
+
+from core.cache import SimpleLRU
+from core.database import bump_shared_cache_version, shared_cache_version
 
 POSTGRES_ENABLED = False
 _pg_connect = None
@@ -19,6 +25,15 @@ def configure_feedback(postgres_enabled, pg_connect, psycopg2_module, mask_user_
     FEEDBACK_LOOKBACK_LIMIT = feedback_lookback_limit
 
 
+# (lat, lon, tol, limit) -> (ts, version, rows)：回饋頁、趨勢圖、nowcast、AI 摘要開同一間廁所時各查一次 Neon，
+# 短暫記住同一份結果。寫入新回饋會把 cache.db 的 "feedback" 版本號 +1，
+# 送出後轉址到另一個 worker 的回饋頁也會比對到新版本、重新查詢
+_FEEDBACK_VERSION_KEY = "feedback"
+FEEDBACK_COORD_CACHE_TTL = int(os.getenv("FEEDBACK_COORD_CACHE_TTL", "60"))
+_FEEDBACK_COORD_CACHE = SimpleLRU(maxsize=int(os.getenv("FEEDBACK_COORD_CACHE_SIZE", "1000")))
+_FEEDBACK_COORD_LOCK = threading.Lock()
+
+
 def _insert_feedback_pg(name, address, rating, toilet_paper, accessibility, time_of_use,
                         comment, cleanliness_score, lat, lon, floor_hint="", uid=""):
     if not POSTGRES_ENABLED:
@@ -47,6 +62,9 @@ def _insert_feedback_pg(name, address, rating, toilet_paper, accessibility, time
             mask_user_id(uid) if uid else None,
         ))
         conn.commit()
+        with _FEEDBACK_COORD_LOCK:
+            _FEEDBACK_COORD_CACHE.clear()
+        bump_shared_cache_version(_FEEDBACK_VERSION_KEY)
         return True
     except Exception as e:
         if conn:
@@ -73,6 +91,14 @@ def _fetch_feedback_pg_by_coord(lat, lon, tol=1e-6, limit=None):
         limit = int(limit or FEEDBACK_LOOKBACK_LIMIT or 4000)
     except Exception:
         limit = 4000
+    key = (float(lat_f), float(lon_f), float(tol), limit)
+    # 版本號在查 Neon 之前取得；讀不到版本（None）就不用也不存快取
+    version = shared_cache_version(_FEEDBACK_VERSION_KEY)
+    with _FEEDBACK_COORD_LOCK:
+        hit = _FEEDBACK_COORD_CACHE.get(key)
+    if hit and version is not None and hit[1] == version and time.time() - hit[0] < FEEDBACK_COORD_CACHE_TTL:
+        # 呼叫端只讀各列，不改內容；給新的 list 外殼即可
+        return list(hit[2])
     conn = None
     try:
         conn = _pg_connect()
@@ -85,7 +111,11 @@ def _fetch_feedback_pg_by_coord(lat, lon, tol=1e-6, limit=None):
             ORDER BY created_at DESC
             LIMIT %s
         """, (float(lat_f), float(tol), float(lon_f), float(tol), limit))
-        return [dict(r) for r in (cur.fetchall() or [])]
+        rows = [dict(r) for r in (cur.fetchall() or [])]
+        if version is not None:
+            with _FEEDBACK_COORD_LOCK:
+                _FEEDBACK_COORD_CACHE.set(key, (time.time(), version, rows))
+        return list(rows)
     except Exception as e:
         logging.error(f"fetch toilet_feedbacks by coord failed: {e}", exc_info=True)
         return []
@@ -150,20 +180,25 @@ def _feedback_rows_to_summary(rows):
         summary += f"💬 最新留言：{comments[0]}"
     return summary
 
-def get_feedbacks_by_coord(lat, lon, tol=1e-6):
+def get_feedbacks_by_coord(lat, lon, tol=1e-6, rows=None):
+    """rows：呼叫端已用 _fetch_feedback_pg_by_coord 取回的同一批資料（給了就不再查一次 Neon）。"""
     if not POSTGRES_ENABLED:
         return []
     try:
-        return [_feedback_pg_to_public(row) for row in _fetch_feedback_pg_by_coord(lat, lon, tol=tol)]
+        if rows is None:
+            rows = _fetch_feedback_pg_by_coord(lat, lon, tol=tol)
+        return [_feedback_pg_to_public(row) for row in rows]
     except Exception as e:
         logging.error(f"❌ 讀取回饋列表（Neon 座標）錯誤: {e}", exc_info=True)
         return []
 
-def get_feedback_summary_by_coord(lat, lon, tol=1e-6):
+def get_feedback_summary_by_coord(lat, lon, tol=1e-6, rows=None):
     if not POSTGRES_ENABLED:
         return "尚無回饋資料"
     try:
-        return _feedback_rows_to_summary(_fetch_feedback_pg_by_coord(lat, lon, tol=tol))
+        if rows is None:
+            rows = _fetch_feedback_pg_by_coord(lat, lon, tol=tol)
+        return _feedback_rows_to_summary(rows)
     except Exception as e:
         logging.error(f"❌ 查詢回饋統計（Neon 座標）錯誤: {e}", exc_info=True)
         return "讀取錯誤"
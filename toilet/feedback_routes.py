@@ -244,8 +244,10 @@ def toilet_feedback_by_coord(lat, lon):
 
     try:
         name = f"廁所（{lat}, {lon}）"
-        summary = get_feedback_summary_by_coord(lat, lon)
-        feedbacks = get_feedbacks_by_coord(lat, lon)
+        # 摘要與列表用同一批資料：只查一次 Neon（原本兩個函式各自撈最多 4000 筆）
+        rows = _fetch_feedback_pg_by_coord(lat, lon)
+        summary = get_feedback_summary_by_coord(lat, lon, rows=rows)
+        feedbacks = get_feedbacks_by_coord(lat, lon, rows=rows)
         scores = []
         for fb in feedbacks:
             try:
@@ -1,8 +1,13 @@
 import os
+import atexit
 import logging
+import threading
+import time
+from datetime import datetime, timezone
 
 POSTGRES_ENABLED = False
 _pg_connect = None
+psycopg2 = None
 mask_user_id = None
 compute_nts_score = None
 sort_toilets_nts_1_0 = None
@@ -15,10 +20,12 @@ def configure_recommendation_logs(
     compute_nts_score_func,
     sort_toilets_nts_1_0_func,
     make_toilet_id_func,
+    psycopg2_module=None,
 ):
-    global POSTGRES_ENABLED, _pg_connect, mask_user_id, compute_nts_score, sort_toilets_nts_1_0, _make_toilet_id
+    global POSTGRES_ENABLED, _pg_connect, psycopg2, mask_user_id, compute_nts_score, sort_toilets_nts_1_0, _make_toilet_id
     POSTGRES_ENABLED = postgres_enabled
     _pg_connect = pg_connect
+    psycopg2 = psycopg2_module
     mask_user_id = mask_user_id_func
     compute_nts_score = compute_nts_score_func
     sort_toilets_nts_1_0 = sort_toilets_nts_1_0_func
@@ -68,14 +75,14 @@ def log_recommendation_results(query_id, uid, user_lat, user_lon, toilets, limit
 
         conn = _pg_connect()
         cur = conn.cursor()
-        cur.executemany("""
+        psycopg2.extras.execute_values(cur, """
             INSERT INTO recommendation_logs (
                 query_id, user_id_hash, user_lat, user_lon,
                 rank, toilet_id, toilet_name, distance_m,
                 distance_score, trust_score, info_score, status_score,
                 nts_score, source, verification_status, model_version
             )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            VALUES %s
         """, rows)
         conn.commit()
         conn.close()
@@ -120,7 +127,7 @@ def log_shadow_recommendation_results(query_id, uid, user_lat, user_lon, toilets
             ))
         conn = _pg_connect()
         cur = conn.cursor()
-        cur.executemany("""
+        psycopg2.extras.execute_values(cur, """
             INSERT INTO recommendation_shadow_logs (
                 query_id, user_id_hash, user_lat, user_lon,
                 production_model_version, shadow_model_version,
@@ -128,7 +135,7 @@ def log_shadow_recommendation_results(query_id, uid, user_lat, user_lon, toilets
                 distance_score, trust_score, info_score, status_score,
                 nts_score, source, verification_status
             )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            VALUES %s
         """, rows)
         conn.commit()
         conn.close()
@@ -136,54 +143,143 @@ def log_shadow_recommendation_results(query_id, uid, user_lat, user_lon, toilets
         logging.warning(f"log_shadow_recommendation_results failed: {e}", exc_info=True)
 
 
+# === user_actions / source_query_logs 緩衝寫入 ===
+# 每次搜尋會記 4 筆以上來源耗時，點導航也要先寫一筆 user_actions 才轉址；原本每筆都開一次
+# Neon 連線（含 TLS）並 commit，而且就在使用者等待的路徑上。改成先進記憶體佇列，
+# 累積 N 筆或每隔幾秒由背景執行緒用同一條連線一次寫入。created_at 在排入時就決定，
+# 不會因為延後寫入而偏移。
+_USER_ACTION_SQL = """
+    INSERT INTO user_actions (
+        query_id, user_id_hash, toilet_id, action_type, extra_info, created_at
+    )
+    VALUES %s
+"""
+_SOURCE_QUERY_SQL = """
+    INSERT INTO source_query_logs (
+        query_id, user_id_hash, model_version, source_name,
+        used_osm, result_count, elapsed_ms, success, reason, error_message, created_at
+    )
+    VALUES %s
+"""
+_LOG_BUF = []  # (sql, row)
+_LOG_LOCK = threading.Lock()
+_LOG_FLUSH_N = int(os.getenv("SOURCE_LOG_FLUSH_N", "50"))
+_LOG_FLUSH_SEC = float(os.getenv("SOURCE_LOG_FLUSH_SEC", "5"))
+_LOG_WORKER_STARTED = False
+
+
+def _enqueue_log(sql, row):
+    with _LOG_LOCK:
+        _LOG_BUF.append((sql, row))
+        full = len(_LOG_BUF) >= _LOG_FLUSH_N
+    if full:
+        flush_pending_logs()
+    else:
+        _start_log_worker()
+
+
+def _write_log_rows(conn, sql, rows):
+    """
+    一個 INSERT 帶多列 VALUES 寫入（executemany 仍是每列一個 statement）。
+    整批失敗時 rollback 後逐筆重試，只丟掉真正寫不進去的那幾筆，不拖累同批其他紀錄。
+    """
+    cur = conn.cursor()
+    try:
+        psycopg2.extras.execute_values(cur, sql, rows, page_size=max(len(rows), 1))
+        conn.commit()
+        return
+    except Exception as e:
+        conn.rollback()
+        logging.warning("log batch insert failed (%d rows), retrying one by one: %s", len(rows), e)
+
+    dropped = 0
+    for row in rows:
+        try:
+            psycopg2.extras.execute_values(cur, sql, [row])
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            dropped += 1
+            logging.warning("log row dropped: %s", e)
+    if dropped:
+        logging.warning("log flush dropped %d/%d rows", dropped, len(rows))
+
+
+def flush_pending_logs():
+    global _LOG_BUF
+    with _LOG_LOCK:
+        if not _LOG_BUF:
+            return
+        pending, _LOG_BUF = _LOG_BUF, []
+    by_sql = {}
+    for sql, row in pending:
+        by_sql.setdefault(sql, []).append(row)
+    try:
+        conn = _pg_connect()
+        try:
+            for sql, rows in by_sql.items():
+                _write_log_rows(conn, sql, rows)
+        finally:
+            conn.close()
+    except Exception as e:
+        logging.warning("log flush failed (%d rows): %s", len(pending), e, exc_info=True)
+
+
+def _start_log_worker():
+    global _LOG_WORKER_STARTED
+    if _LOG_WORKER_STARTED:
+        return
+    with _LOG_LOCK:
+        if _LOG_WORKER_STARTED:
+            return
+        _LOG_WORKER_STARTED = True
+
+    def loop():
+        while True:
+            time.sleep(_LOG_FLUSH_SEC)
+            flush_pending_logs()
+
+    threading.Thread(target=loop, name="query-log-flush", daemon=True).start()
+
+
+atexit.register(flush_pending_logs)
+
+
 def log_user_action(query_id, uid, toilet_id, action_type, extra_info=""):
     """
     記錄使用者後續行為，例如點導航、回報問題、加入最愛。
+    只排入緩衝區，實際寫入由 flush_pending_logs() 批次完成。
     """
     if not POSTGRES_ENABLED:
         return
 
     try:
-        conn = _pg_connect()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO user_actions (
-                query_id, user_id_hash, toilet_id, action_type, extra_info
-            )
-            VALUES (%s, %s, %s, %s, %s)
-        """, (
+        row = (
             query_id or "",
             mask_user_id(uid),
             str(toilet_id or ""),
             action_type,
-            extra_info or ""
-        ))
-        conn.commit()
-        conn.close()
-
+            extra_info or "",
+            datetime.now(timezone.utc)
+        )
     except Exception as e:
         logging.warning(f"log_user_action failed: {e}", exc_info=True)
+        return
+    _enqueue_log(_USER_ACTION_SQL, row)
 
 
 def log_source_query(query_id, uid, source_name, result_count=0, elapsed_ms=None, success=True, reason="", error_message="", used_osm=False):
     """
     記錄各資料來源查詢耗時與 OSM fallback 使用情形。
     用來比較：不用 OSM / 使用 OSM 的次數與耗時。
+    只排入緩衝區，實際寫入由 flush_pending_logs() 批次完成。
     """
     if not POSTGRES_ENABLED:
         return
 
     try:
         model_version = os.getenv("NTS_MODEL_VERSION", "nts_1_0").strip() or "nts_1_0"
-        conn = _pg_connect()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO source_query_logs (
-                query_id, user_id_hash, model_version, source_name,
-                used_osm, result_count, elapsed_ms, success, reason, error_message
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
+        row = (
             query_id or "",
             mask_user_id(uid),
             model_version,
@@ -193,10 +289,10 @@ def log_source_query(query_id, uid, source_name, result_count=0, elapsed_ms=None
             int(elapsed_ms) if elapsed_ms is not None else None,
             bool(success),
             reason or "",
-            str(error_message or "")[:500]
-        ))
-        conn.commit()
-        conn.close()
+            str(error_message or "")[:500],
+            datetime.now(timezone.utc)
+        )
     except Exception as e:
         logging.warning(f"log_source_query failed: {e}", exc_info=True)
-
+        return
+    _enqueue_log(_SOURCE_QUERY_SQL, row)
@@ -17,7 +17,10 @@ from toilet.data_sources import query_public_csv_toilets, query_saved_toilets, q
 from toilet.recommendation_logs import log_source_query
 
 # === 共用執行緒池（避免每次臨時建立） ===
-_pool = ThreadPoolExecutor(max_workers=2)
+# CSV/Neon/OSM 三個來源可同時查；OSM 是 I/O 等待，與本地查詢重疊最划算
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("SEARCH_POOL_WORKERS", "4")))
+# /nearby API 另用一個池：Overpass 卡住時只佔住這裡的執行緒，不會拖垮 LINE 定位查詢共用的 _pool
+_api_pool = ThreadPoolExecutor(max_workers=int(os.getenv("NEARBY_API_POOL_WORKERS", "3")))
 
 
 def _merge_and_dedupe_lists(*lists, dist_th=35, name_sim_th=0.55):
@@ -28,49 +31,60 @@ def _merge_and_dedupe_lists(*lists, dist_th=35, name_sim_th=0.55):
     all_pts.sort(key=lambda x: x.get("distance", 1e9))
 
     merged = []
+    # bucket -> [(lat, lon, lower_name)]：已收錄點的座標/小寫名稱只算一次
     buckets = {}
+    # 完全相同座標 + 名稱（同一間廁所出現在多個來源時最常見）直接 O(1) 判重
+    exact_seen = set()
     # 0.0005 degrees is roughly 50m in Taiwan latitude, enough for a 35m duplicate threshold.
     grid_size = 0.0005
 
-    def _bucket_key(lat, lon):
-        return (int(float(lat) / grid_size), int(float(lon) / grid_size))
-
     def _neighbor_keys(key):
         x, y = key
         for dx in (-1, 0, 1):
             for dy in (-1, 0, 1):
                 yield (x + dx, y + dy)
 
+    def _similar(a, b):
+        if a == b:
+            return True
+        sm = SequenceMatcher(None, a, b)
+        # real_quick_ratio / quick_ratio 是 ratio 的上界，先用便宜的上界排除
+        return (
+            sm.real_quick_ratio() >= name_sim_th
+            and sm.quick_ratio() >= name_sim_th
+            and sm.ratio() >= name_sim_th
+        )
+
     for p in all_pts:
+        p_name = (p.get("name") or "").lower()
         try:
-            p_key = _bucket_key(p["lat"], p["lon"])
-            candidate_pool = []
-            for k in _neighbor_keys(p_key):
-                candidate_pool.extend(buckets.get(k, []))
+            p_lat = float(p["lat"])
+            p_lon = float(p["lon"])
+            p_key = (int(p_lat / grid_size), int(p_lon / grid_size))
         except Exception:
-            p_key = None
-            candidate_pool = merged
+            # 座標壞掉的點無法比對距離，直接收錄（原本 near 也一律為 False）
+            merged.append(p)
+            continue
+
+        exact_key = (p_lat, p_lon, p_name)
+        if exact_key in exact_seen:
+            continue
 
         dup = False
-        p_name = (p.get("name") or "").lower()
-        for q in candidate_pool:
-            try:
-                near = haversine(p["lat"], p["lon"], q["lat"], q["lon"]) <= dist_th
-            except Exception:
-                near = False
-            if not near:
-                continue
-
-            q_name = (q.get("name") or "").lower()
-            sim = SequenceMatcher(None, p_name, q_name).ratio()
-            if sim >= name_sim_th:
-                dup = True
+        for k in _neighbor_keys(p_key):
+            for q_lat, q_lon, q_name in buckets.get(k, ()):
+                if haversine(p_lat, p_lon, q_lat, q_lon) > dist_th:
+                    continue
+                if _similar(p_name, q_name):
+                    dup = True
+                    break
+            if dup:
                 break
 
         if not dup:
             merged.append(p)
-            if p_key is not None:
-                buckets.setdefault(p_key, []).append(p)
+            buckets.setdefault(p_key, []).append((p_lat, p_lon, p_name))
+            exact_seen.add(exact_key)
     return merged
 
 
@@ -84,11 +98,26 @@ def nearby_toilets():
     if user_lat is None or user_lon is None:
         return {"error": _api_L("位置參數錯誤", "Invalid location parameters")}, 400
 
-    public_csv_toilets = query_public_csv_toilets(user_lat, user_lon, radius=500) or []
-    saved_toilets = query_saved_toilets(user_lat, user_lon, radius=500) or []
-    osm_toilets = query_overpass_toilets(user_lat, user_lon, radius=500) or []
+    # 三個來源並行查詢，總延遲約等於最慢的那個（通常是 Overpass）；
+    # 整體最多等 LOC_QUERY_TIMEOUT_SEC，逾時的來源當作沒有結果
+    futures = [
+        ("csv", _api_pool.submit(query_public_csv_toilets, user_lat, user_lon, 500)),
+        ("saved", _api_pool.submit(query_saved_toilets, user_lat, user_lon, 500)),
+        ("osm", _api_pool.submit(query_overpass_toilets, user_lat, user_lon, 500)),
+    ]
+    deadline = time.time() + LOC_QUERY_TIMEOUT_SEC
+    results = []
+    for name, fut in futures:
+        try:
+            results.append(fut.result(timeout=max(0.0, deadline - time.time())) or [])
+        except FuturesTimeoutError:
+            logging.warning("%s 查詢逾時", name)
+            results.append([])
+        except Exception as e:
+            logging.warning("%s 查詢失敗: %s", name, e)
+            results.append([])
 
-    all_toilets = _merge_and_dedupe_lists(public_csv_toilets, saved_toilets, osm_toilets)
+    all_toilets = _merge_and_dedupe_lists(*results)
     sort_toilets(all_toilets)
 
     if not all_toilets:
@@ -116,7 +145,7 @@ def build_nearby_toilets(uid, lat, lon, radius=500):
 
     cached = get_cached_data(query_key)
     if cached:
-        logging.debug(f"[cache hit] nearby {query_key}")
+        logging.debug("[cache hit] nearby %s", query_key)
         return cached
 
     query_id_for_source = "SRC_" + uuid.uuid4().hex[:16]
@@ -150,7 +179,7 @@ def build_nearby_toilets(uid, lat, lon, radius=500):
                 )
             except FuturesTimeoutError:
                 elapsed_ms = int((time.time() - source_start) * 1000)
-                logging.warning(f"{name} 查詢逾時")
+                logging.warning("%s 查詢逾時", name)
                 log_source_query(query_id_for_source, uid, name, 0, elapsed_ms, False, "timeout", "timeout", False)
             except Exception as e:
                 elapsed_ms = int((time.time() - source_start) * 1000)
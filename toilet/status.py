@@ -1,7 +1,11 @@
 import os
 import logging
+import math
 import time
 
+from core.database import bump_shared_cache_version, shared_cache_version
+from core.utils import bbox_bounds
+
 POSTGRES_ENABLED = False
 _pg_connect = None
 psycopg2 = None
@@ -13,6 +17,11 @@ _STATUS_INDEX_TTL = 180
 _STATUS_NEAR_M = 35
 _STATUS_TTL_HOURS = 6
 _status_index_cache = {"ts": 0, "data": {}}
+# 使用回顧/徽章頁每次都要讀最近 4000 筆回報；短暫快取。
+# 新回報會把 cache.db 的 "status" 版本號 +1，各 worker 命中前比對，不會漏掉別的 worker 剛寫入的回報
+_STATUS_ROWS_TTL = int(os.getenv("STATUS_ROWS_TTL", "60"))
+_STATUS_VERSION_KEY = "status"
+_status_rows_cache = {"ts": 0, "version": None, "data": None}
 # _STATUS_INDEX_TTL is defined in global config section (see above)
 
 
@@ -39,6 +48,8 @@ def submit_status_update(lat, lon, status_text, user_id="", display_name="", not
         conn.commit()
         conn.close()
         _status_index_cache["ts"] = 0
+        _status_rows_cache["ts"] = 0
+        bump_shared_cache_version(_STATUS_VERSION_KEY)
         return True
     except Exception as e:
         logging.error(f"寫入 Neon 狀態失敗: {e}", exc_info=True)
@@ -50,6 +61,26 @@ def _is_close_m(lat1, lon1, lat2, lon2, th=_STATUS_NEAR_M):
     except:
         return False
 
+# 合併時用的格網：每格約 55 公尺，查 35 公尺內只需看鄰近幾格
+_STATUS_GRID_DEG = 0.0005
+
+
+def _grid_key(lat_f, lon_f):
+    return (math.floor(lat_f / _STATUS_GRID_DEG), math.floor(lon_f / _STATUS_GRID_DEG))
+
+
+def _grid_has_close(grid, lat_f, lon_f, th=_STATUS_NEAR_M):
+    min_lat, max_lat, min_lon, max_lon = bbox_bounds(lat_f, lon_f, th)
+    ix0, iy0 = _grid_key(min_lat, min_lon)
+    ix1, iy1 = _grid_key(max_lat, max_lon)
+    for ix in range(ix0, ix1 + 1):
+        for iy in range(iy0, iy1 + 1):
+            for m_lat, m_lon in grid.get((ix, iy), ()):
+                if haversine(lat_f, lon_f, m_lat, m_lon) <= th:
+                    return True
+    return False
+
+
 def build_status_index():
     """Build recent status index from Neon toilet_status_reports."""
     if not POSTGRES_ENABLED:
@@ -75,20 +106,26 @@ def build_status_index():
         rows = cur.fetchall()
         conn.close()
         merged = []
+        # 已收錄的點依格網分桶：新資料只跟附近格子比距離，不必掃過全部 merged
+        grid = {}
         for r in rows:
+            if len(merged) >= STATUS_INDEX_MAX_KEYS:
+                break
             lat_s, lon_s = norm_coord(r.get("lat")), norm_coord(r.get("lon"))
             st = (r.get("status") or "").strip()
-            ts = r.get("created_at")
-            ts_s = ts.isoformat() if hasattr(ts, "isoformat") else str(ts or "")
             if not st:
                 continue
-            placed = False
-            for m in merged:
-                if _is_close_m(lat_s, lon_s, m["lat"], m["lon"]):
-                    placed = True
-                    break
-            if not placed and len(merged) < STATUS_INDEX_MAX_KEYS:
-                merged.append({"lat": lat_s, "lon": lon_s, "status": st, "ts": ts_s})
+            try:
+                lat_f, lon_f = float(lat_s), float(lon_s)
+            except Exception:
+                lat_f = lon_f = None
+            if lat_f is not None:
+                if _grid_has_close(grid, lat_f, lon_f):
+                    continue
+                grid.setdefault(_grid_key(lat_f, lon_f), []).append((lat_f, lon_f))
+            ts = r.get("created_at")
+            ts_s = ts.isoformat() if hasattr(ts, "isoformat") else str(ts or "")
+            merged.append({"lat": lat_s, "lon": lon_s, "status": st, "ts": ts_s})
         for m in merged:
             out[(m["lat"], m["lon"])] = {"status": m["status"], "ts": m["ts"]}
         _status_index_cache.update(ts=now, data=out)
@@ -110,6 +147,13 @@ def _read_status_rows():
     """Read status rows from Neon for achievements/badges pages."""
     if not POSTGRES_ENABLED:
         return []
+    now = time.time()
+    version = shared_cache_version(_STATUS_VERSION_KEY)
+    if (_status_rows_cache["data"] is not None and version is not None
+            and _status_rows_cache["version"] == version
+            and now - _status_rows_cache["ts"] < _STATUS_ROWS_TTL):
+        # 呼叫端只讀不改，直接回傳同一份
+        return _status_rows_cache["data"]
     try:
         conn = _pg_connect()
         cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
@@ -132,6 +176,7 @@ def _read_status_rows():
                 "display_name": r.get("display_name") or "",
                 "timestamp": ts.isoformat() if hasattr(ts, "isoformat") else str(ts or ""),
             })
+        _status_rows_cache.update(ts=now, version=version, data=out)
         return out
     except Exception as e:
         logging.error(f"_read_status_rows Neon error: {e}")
@@ -1,10 +1,12 @@
 import os
 import json
 import logging
-import requests
 import traceback
 from flask import request, render_template
 
+from core.cache import invalidate_contrib_cache
+from core.http import http_session_no_retry, nominatim_throttle, response_json
+
 POSTGRES_ENABLED = False
 _pg_connect = None
 _CACHE = None
@@ -49,9 +51,10 @@ def render_add_page():
             ua_email = os.getenv("CONTACT_EMAIL", "you@example.com")
             url = f"https://nominatim.openstreetmap.org/reverse?format=jsonv2&lat={lat}&lon={lon}&addressdetails=1"
             headers = {"User-Agent": f"ToiletBot/1.0 (+{ua_email})"}
-            resp = requests.get(url, headers=headers, timeout=10)
+            nominatim_throttle()
+            resp = http_session_no_retry.get(url, headers=headers, timeout=10)
             if resp.status_code == 200:
-                data = resp.json()
+                data = response_json(resp)
                 a = data.get("address", {})
                 pretty = " ".join(filter(None, [
                     a.get("country", ""),
@@ -189,8 +192,8 @@ def submit_toilet():
         new_id = cur.fetchone()[0]
         conn.commit()
         conn.close()
-        try: _CACHE.clear()
-        except Exception: pass
+        # 新增只影響送出者自己的貢獻清單
+        invalidate_contrib_cache(uid)
 
         if verification_status == "approved":
             msg = f"✅ 已收到 {name}，系統自動驗證為低風險，已加入推薦資料。"